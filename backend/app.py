@@ -1,3 +1,14 @@
+import os
+# app.run(debug=True) imports this module twice: in the reloader, which only watches the sources and restarts the
+# server, and in the server process it starts with WERKZEUG_RUN_MAIN set. Only the server process runs jobs.
+RELOADER_PROCESS = __name__ == '__main__' and os.environ.get('WERKZEUG_RUN_MAIN') != 'true'
+
+# Before numpy, torch and OpenCV are loaded: their thread pools are sized when they load.
+from governor import MACHINE_CORES, pin_web_process, split_cores
+WEB_CORE_SET, _ = split_cores(MACHINE_CORES)
+if not RELOADER_PROCESS:
+    pin_web_process(WEB_CORE_SET)
+
 import cv2
 import torch
 import numpy as np
@@ -10,12 +21,19 @@ import io
 import base64
 import threading
 import multiprocessing
+import queue
 import uuid
 from flask import send_from_directory
-from simulation_runner import run_openfoam_simulation
-from optimization_runner import run_binary_search_optimization, run_ga_optimization
+from simulation_runner import config_hash, estimate_simulation, run_openfoam_simulation
+from optimization_runner import (
+    BINARY_SEARCH_SETTINGS, GA_SETTINGS, estimate_binary_search, estimate_ga, ga_screening_kwargs,
+    run_binary_search_optimization, run_ga_optimization
+)
+from simulation.estimator import CostModelHistory, budget_violation
+from jobs import JobQueue
+from job_registry import FINAL_STATUSES, JobRegistry
+from retention import restore_run, start_retention, touch
 import json
-import os
 
 USE_MOCK_CHATBOT = True
 
@@ -26,6 +44,9 @@ else:
 
 
 # --- 1. Model Loading & Global Setup ---
+# Inference shares the web process' cores, the rest belong to simulation jobs (see governor.py).
+torch.set_num_threads(len(WEB_CORE_SET))
+cv2.setNumThreads(len(WEB_CORE_SET))
 print("Loading DINOv2 model...")
 DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
 DINO_PROCESSOR = AutoImageProcessor.from_pretrained("facebook/dinov2-base")
@@ -37,9 +58,17 @@ app = Flask(__name__)
 CORS(app)
 app.static_folder = 'dist/assets'
 manager = multiprocessing.Manager()
-simulations_db = manager.dict()
+# Durable job records shared by every process (see job_registry.py); simulations_db[run_id] is the status.
+simulations_db = JobRegistry(os.path.join('simulations', 'jobs.sqlite3'))
+# Live stage/iteration/residual snapshots of running jobs, keyed by run_id.
+progress_db = simulations_db.progress
 chat_sessions = manager.dict()
+# Bounded queue of simulation jobs, at most one running job per N_PROCS cores (see jobs.py).
+job_queue = None if RELOADER_PROCESS else JobQueue(simulations_db)
 mock_chat_sessions_store = {}
+# Compacts, archives and evicts finished runs in the background (see retention.py).
+if not RELOADER_PROCESS:
+    start_retention('simulations', simulations_db)
 
 # --- 2. Core Computer Vision & AI Functions (from your reference code) ---
 
@@ -198,52 +227,141 @@ def autofill_endpoint():
             
     return jsonify({"newly_classified": newly_classified})
 
+# Cost estimate of each job kind, see simulation/estimator.py.
+JOB_ESTIMATORS = {
+    'simulation': estimate_simulation,
+    'binary_search': estimate_binary_search,
+    'ga': estimate_ga,
+}
+# Cost model fitted on the manifests of past runs, refitted when a run completes.
+COST_HISTORY = CostModelHistory('simulations')
+
+
+def estimate_job(kind, config):
+    """Estimate of a job and the reason it exceeds the job budget (None if it fits)."""
+    estimate = JOB_ESTIMATORS[kind](config, COST_HISTORY.model())
+    return estimate, budget_violation(estimate)
+
+
+@app.route('/api/estimate', methods=['POST'])
+def estimate_endpoint():
+    """Dry run: predicted cells, memory and wall time of a job, without starting it."""
+    data = request.json
+    kind = data.get('kind', 'simulation')
+    if kind not in JOB_ESTIMATORS:
+        return jsonify({"error": f"Unknown job kind {kind}"}), 400
+    try:
+        estimate, violation = estimate_job(kind, data['config'])
+    except (KeyError, ValueError, TypeError) as e:
+        return jsonify({"error": f"Invalid configuration: {e}"}), 400
+    return jsonify({"kind": kind, "estimate": estimate, "within_budget": violation is None, "reason": violation})
+
+
+def over_budget_response(kind, config):
+    """Error response for a job that exceeds the budget, or None when it may start."""
+    try:
+        estimate, violation = estimate_job(kind, config)
+    except (KeyError, ValueError, TypeError) as e:
+        return jsonify({"error": f"Invalid configuration: {e}"}), 400
+    if violation is not None:
+        return jsonify({"error": f"Job rejected: {violation}", "estimate": estimate}), 400
+    return None
+
+
+# Settings besides the job config that shape the result of each job kind, part of its config hash.
+JOB_SETTINGS = {
+    'simulation': {},
+    'binary_search': BINARY_SEARCH_SETTINGS,
+    'ga': {**GA_SETTINGS, 'screening': ga_screening_kwargs()},
+}
+
+
+# Runner, running status and resume arguments (None: restarts from scratch) of each job kind.
+JOB_TARGETS = {
+    'simulation': (run_openfoam_simulation, "running", {'resume': True}),
+    'binary_search': (run_binary_search_optimization, "running_optimization", None),
+    'ga': (run_ga_optimization, "running_optimization", None),
+}
+
+
+def enqueue(kind, run_id, config, resume=False):
+    """Submits a registered job to the queue. Raises queue.Full when the queue is at capacity."""
+    target, status, resume_kwargs = JOB_TARGETS[kind]
+    kwargs = {'progress_db': progress_db}
+    if resume and resume_kwargs is not None:
+        kwargs.update(resume_kwargs)
+    # Jobs run in their own process once a worker is free.
+    return job_queue.submit(
+        run_id, target, args=(config, run_id, simulations_db), kwargs=kwargs, status=status,
+        scratch_dirs=[os.path.join('simulations', run_id)], resume_kwargs=resume_kwargs
+    )
+
+
+def resume_interrupted_jobs():
+    """
+    Queues the jobs whose owning process died (a previous server, a crashed worker or job process); simulations
+    continue from their checkpoints. Jobs still run by a live process, e.g. of another worker, are left alone.
+    """
+    for job in simulations_db.take_interrupted():
+        try:
+            enqueue(job['kind'], job['run_id'], job['params'], resume=True)
+        except (KeyError, queue.Full):
+            simulations_db[job['run_id']] = "failed"
+            continue
+        print(f"Resuming {job['kind']} job {job['run_id']}")
+
+
+def submit_job(kind, config, message):
+    """
+    Queues a job, unless an identical one (same config hash) already completed or is in flight: then the existing
+    run_id is returned and no new case is run.
+    """
+    rejected = over_budget_response(kind, config)
+    if rejected is not None:
+        return rejected
+
+    run_id = str(uuid.uuid4())
+    run_id, existing_status = simulations_db.claim(
+        run_id, kind, config_hash(kind, config, JOB_SETTINGS[kind]), params=config,
+        result_dir=os.path.join('simulations', run_id)
+    )
+    if existing_status == "completed":
+        return jsonify({"message": "Identical job already completed", "run_id": run_id, "status": existing_status,
+                        "cached": True}), 200
+    if existing_status is not None:
+        return jsonify({"message": "Attached to an identical job in progress", "run_id": run_id,
+                        "status": existing_status, "cached": True,
+                        "queue_position": job_queue.position(run_id)}), 202
+
+    try:
+        position = enqueue(kind, run_id, config)
+    except queue.Full:
+        simulations_db[run_id] = "rejected"
+        return jsonify({"error": "Too many jobs are waiting, try again later"}), 503
+    return jsonify({"message": message, "run_id": run_id, "queue_position": position}), 202
+
 @app.route('/api/run-simulation', methods=['POST'])
 def run_simulation_endpoint():
     config = request.json
-    run_id = str(uuid.uuid4())
 
     if 'physics' not in config:
         config['physics'] = {}
 
-    # Use multiprocessing.Process instead of threading.Thread
-    # The 'simulations_db' is now a special managed dictionary that can be passed to the new process
-    process = multiprocessing.Process(
-        target=run_openfoam_simulation, 
-        args=(config, run_id, simulations_db)
-    )
-    process.start()
-    
-    # Set the initial status in the shared dictionary
-    simulations_db[run_id] = "running"
-    
-    return jsonify({"message": "Simulation started", "run_id": run_id}), 202
+    return submit_job('simulation', config, "Simulation queued")
 
 @app.route('/api/run-binary-search', methods=['POST'])
 def run_binary_search_endpoint():
     """Endpoint to start a binary search optimization for CRAC temperature."""
-    config = request.json
-    run_id = str(uuid.uuid4())
-    process = multiprocessing.Process(
-        target=run_binary_search_optimization,
-        args=(config, run_id, simulations_db)
-    )
-    process.start()
-    simulations_db[run_id] = "running_optimization"
-    return jsonify({"message": "Binary search optimization started", "run_id": run_id}), 202
+    return submit_job('binary_search', request.json, "Binary search optimization queued")
 
 @app.route('/api/run-ga-optimization', methods=['POST'])
 def run_ga_endpoint():
     """Endpoint to start a genetic algorithm optimization for layout."""
-    config = request.json
-    run_id = str(uuid.uuid4())
-    process = multiprocessing.Process(
-        target=run_ga_optimization,
-        args=(config, run_id, simulations_db)
-    )
-    process.start()
-    simulations_db[run_id] = "running_optimization"
-    return jsonify({"message": "Genetic algorithm optimization started", "run_id": run_id}), 202
+    return submit_job('ga', request.json, "Genetic algorithm optimization queued")
+
+# Jobs interrupted by a restart or deploy pick up where they stopped.
+if not RELOADER_PROCESS:
+    resume_interrupted_jobs()
 
 # --- NEW: CHATBOT ENDPOINTS ---
 def get_chatbot_for_session(session_id):
@@ -298,12 +416,47 @@ def simulation_status_endpoint(run_id):
     status = simulations_db.get(run_id, "not_found")
     # print(status)
     # print(str(status))
-    return jsonify({"run_id": run_id, "status": status})
+    return jsonify({
+        "run_id": run_id,
+        "status": status,
+        "progress": progress_db.get(run_id),
+        "queue_position": job_queue.position(run_id),
+    })
+
+@app.route('/api/cancel/<run_id>', methods=['POST'])
+def cancel_endpoint(run_id):
+    """Stops a queued or running job together with its OpenFOAM processes and removes its case directories."""
+    status = simulations_db.get(run_id)
+    if status is None:
+        return jsonify({"error": "Unknown run_id"}), 404
+    if not simulations_db.request_cancel(run_id):
+        return jsonify({"error": f"Job is not running (status: {status})", "run_id": run_id, "status": status}), 409
+    if job_queue.cancel(run_id):
+        return jsonify({"run_id": run_id, "status": "cancelled"})
+    status = simulations_db.get(run_id)
+    if status in FINAL_STATUSES:
+        return jsonify({"error": f"Job is not running (status: {status})", "run_id": run_id, "status": status}), 409
+    # queued or running in another worker process, whose dispatcher carries the cancellation out
+    return jsonify({"run_id": run_id, "status": "cancel_requested"}), 202
+
+@app.route('/api/simulations', methods=['GET'])
+def list_simulations_endpoint():
+    """Newest jobs first, optionally filtered by ?status=, paginated with ?limit= and ?offset=."""
+    jobs = simulations_db.list(
+        status=request.args.get('status'),
+        limit=request.args.get('limit', 100, type=int),
+        offset=request.args.get('offset', 0, type=int),
+    )
+    return jsonify({"simulations": jobs})
 
 @app.route('/api/get-result/<run_id>/<filename>', methods=['GET'])
 def get_result_file(run_id, filename):
-    """Serves the converted .gltf files."""
+    """Serves the converted .gltf files, unpacking the run first if retention archived it."""
     directory = os.path.abspath(os.path.join('simulations', run_id))
+    # dot-directories are caches and archives, not runs
+    if run_id.startswith('.') or (not os.path.isdir(directory) and not restore_run('simulations', run_id)):
+        return jsonify({"error": "Result not found", "status": simulations_db.get(run_id, "not_found")}), 404
+    touch(directory)
     response = send_from_directory(directory, filename)
     response.headers["Access-Control-Allow-Origin"] = "*"
     return response
@@ -0,0 +1,128 @@
+"""
+End-to-end benchmark of the Python side of run_openfoam_simulation. The OpenFOAM applications are replaced by the
+stand-ins in benchmarks/stubs, so what is measured is our own overhead: config transformation, case writing, stage
+dispatch (subprocess handling, log streaming, progress tracking and supervision) and post-processing.
+
+Run from backend/:
+
+    python -m benchmarks.bench_pipeline --sizes 4 16 64 --repeat 3 --json bench.json
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+STUBS_DIR = Path(__file__).resolve().parent / 'stubs'
+EXECUTION_TIME_RE = re.compile(r'^ExecutionTime = (\S+) s', re.MULTILINE)
+STAGES = ('transform_config', 'setup', 'write_all', 'run_all', 'dispatch_overhead', 'max_temp', 'gltf')
+
+
+def scene_config(n_racks: int) -> dict:
+    """A room with rows of 8 racks, a perforated tile in front of every rack and a CRAC per row."""
+    rows = max(1, -(-n_racks // 8))
+    room = [2 + 8 * 0.8 + 2, 2 + rows * 2.4 + 1, 3]
+    racks, tiles, cracs = [], [], []
+    for n in range(n_racks):
+        row, slot = divmod(n, 8)
+        x, y = 2 + slot * 0.8, 2 + row * 2.4
+        racks.append({'name': f'rack{n}', 'pos': [x, y, 0], 'dims': [0.6, 1.0, 2.0], 'power_watts': 5000})
+        tiles.append({'name': f'tile{n}', 'pos': [x, y - 0.7, 0], 'dims': [0.6, 0.6, 0.01]})
+    for row in range(rows):
+        cracs.append({'name': f'crac{row}', 'pos': [room[0] - 1.2, 2 + row * 2.4, 0], 'dims': [1.0, 0.8, 1.8]})
+    return {'room': {'dims': room}, 'racks': racks, 'cracs': cracs, 'tiles': tiles, 'physics': {}}
+
+
+def stub_seconds(case_dir: Path, stages: list[dict]) -> float:
+    """Time spent inside the stand-in applications, from the ExecutionTime they log like OpenFOAM does."""
+    total = 0.0
+    for stage in stages:
+        if stage['kind'] != 'command':
+            continue
+        times = EXECUTION_TIME_RE.findall((case_dir / stage['log']).read_text())
+        total += float(times[-1]) if times else 0.0
+    return total
+
+
+def run_once(config: dict, case_dir: Path, sim_kwargs: dict) -> dict:
+    from simulation.Simulation import Simulation
+    from simulation_runner import transform_config
+
+    timings = {}
+    start = time.perf_counter()
+    regions = transform_config(config)
+    timings['transform_config'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    sim = Simulation(regions, case_dir, **sim_kwargs)
+    timings['setup'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    sim.write_all()
+    timings['write_all'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    sim.run_all()
+    timings['run_all'] = time.perf_counter() - start
+    timings['dispatch_overhead'] = timings['run_all'] - stub_seconds(case_dir, sim.manifest.data['stages'])
+
+    results = sim.get_results()
+    start = time.perf_counter()
+    results.max_temp()
+    timings['max_temp'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if not results.convert_results_to_gltf():
+        raise RuntimeError(f'glTF conversion failed for {case_dir}')
+    timings['gltf'] = time.perf_counter() - start
+    return {'cells': sim.manifest.data['cells'], 'iterations': sim.manifest.data['iterations'], 'timings': timings}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[4, 16, 64], help='racks per scene')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--cell-size', type=float, default=0.25, help='background cell size in metres')
+    parser.add_argument('--geometry-mode', default='faces')
+    parser.add_argument('--output-profile', default='ascii')
+    parser.add_argument('--json', type=Path, help='also write the raw results to this file')
+    parser.add_argument('--keep', action='store_true', help='keep the benchmark cases')
+    args = parser.parse_args()
+
+    os.environ['PATH'] = f'{STUBS_DIR}{os.pathsep}{os.environ["PATH"]}'
+    from simulation.supervisor import ConvergenceCriteria
+    sim_kwargs = {
+        'cell_size': args.cell_size,
+        'geometry_mode': args.geometry_mode,
+        'output_profile': args.output_profile,
+        'convergence': ConvergenceCriteria(),
+    }
+
+    work_dir = Path(tempfile.mkdtemp(prefix='bench_pipeline_'))
+    results = []
+    for size in args.sizes:
+        config = scene_config(size)
+        for repeat in range(args.repeat):
+            run = run_once(config, work_dir / f'racks{size}_{repeat}', sim_kwargs)
+            results.append({'racks': size, 'repeat': repeat, **run})
+
+    print(f"{'racks':>6} {'cells':>8} " + ' '.join(f'{stage:>17}' for stage in STAGES))
+    for size in args.sizes:
+        runs = [r for r in results if r['racks'] == size]
+        medians = [statistics.median(r['timings'][stage] for r in runs) for stage in STAGES]
+        print(f"{size:>6} {runs[0]['cells']:>8} " + ' '.join(f'{m:>16.3f}s' for m in medians))
+
+    if args.json is not None:
+        args.json.write_text(json.dumps({'settings': vars(args), 'runs': results}, indent=2, default=str))
+    if args.keep:
+        print(f'Cases kept in {work_dir}')
+    else:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,363 @@
+"""
+Stand-ins for the OpenFOAM applications the pipeline runs, for benchmarking the Python side without OpenFOAM.
+
+They read the case dictionaries the Simulation class writes, print logs in the format of the real applications (the
+lines the progress tracker and the convergence supervisor parse) and write a synthetic but readable result case: a
+structured background mesh from blockMesh and smooth T, U and p_rgh fields from the solver. snappyHexMesh leaves the
+mesh as it is, so the object patches exist only in the field files. mapFields maps by nearest cell centre.
+"""
+import math
+import os
+import re
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+START = time.perf_counter()
+# Stretches the solver stand-in to mimic a slower machine or a finer mesh.
+SECONDS_PER_ITERATION = float(os.environ.get('FOAM_STUB_SECONDS_PER_ITERATION', '0'))
+
+NUMBER = r'[-+0-9.eE]+'
+
+
+def banner(app: str):
+    print(f'/*---------------------------------------------------------------------------*\\')
+    print(f'  =========                 |')
+    print(f'  \\\\      /  F ield         | OpenFOAM stub for benchmarks')
+    print(f'   \\\\    /   O peration     |')
+    print(f'\\*---------------------------------------------------------------------------*/')
+    print(f'Build  : stub')
+    print(f'Exec   : {app} {" ".join(sys.argv[1:])}')
+    print(f'Case   : {Path.cwd()}')
+    print(f'nProcs : 1')
+    print()
+
+
+def footer():
+    elapsed = time.perf_counter() - START
+    print(f'ExecutionTime = {elapsed:.2f} s  ClockTime = {math.ceil(elapsed)} s')
+    print()
+    print('End')
+
+
+def read_entry(path: Path, keyword: str, default: str | None = None) -> str | None:
+    match = re.search(rf'^\s*{keyword}\s+([^;]*);', path.read_text(), re.MULTILINE)
+    return match.group(1).strip() if match else default
+
+
+def foam_header(cls: str, location: str, obj: str, note: str | None = None) -> str:
+    lines = ['FoamFile', '{', '    version 2.0;', '    format ascii;', f'    class {cls};']
+    if note is not None:
+        lines.append(f'    note "{note}";')
+    lines += [f'    location "{location}";', f'    object {obj};', '}', '']
+    return '\n'.join(lines) + '\n'
+
+
+def write_list(path: Path, header: str, values: list[str]):
+    path.write_text(header + f'{len(values)}\n(\n' + '\n'.join(values) + '\n)\n')
+
+
+def block_mesh_spec(case: Path):
+    """Vertices, cell counts and patches ({name: (axis, side)}) of the single hex block in blockMeshDict."""
+    text = (case / 'system' / 'blockMeshDict').read_text()
+    vertices_text = re.search(r'vertices\s*\((.*?)\)\s*;', text, re.DOTALL).group(1)
+    vertices = np.array(re.findall(rf'\(\s*({NUMBER})\s+({NUMBER})\s+({NUMBER})\s*\)', vertices_text), dtype=float)
+    counts = [int(n) for n in re.search(r'hex\s*\([^)]*\)\s*\(\s*(\d+)\s+(\d+)\s+(\d+)\s*\)', text).groups()]
+
+    lower, upper = vertices.min(axis=0), vertices.max(axis=0)
+    patches = {}
+    for name, faces in re.findall(r'(\w+)\s*\{[^{}]*?faces\s*\(\s*\(([\d\s]+)\)\s*\)\s*;[^{}]*\}', text):
+        coords = vertices[[int(i) for i in faces.split()]]
+        axis = int(np.argmax(np.ptp(coords, axis=0) == 0))
+        patches[name] = (axis, 'max' if np.isclose(coords[0, axis], upper[axis]) else 'min')
+    return lower, upper, counts, patches
+
+
+def structured_mesh(case: Path):
+    """Points, faces, owner, neighbour and boundary patches of the block as an OpenFOAM polyMesh."""
+    lower, upper, (nx, ny, nz), patches = block_mesh_spec(case)
+    axes = [np.linspace(lower[d], upper[d], n + 1) for d, n in enumerate((nx, ny, nz))]
+    z, y, x = np.meshgrid(axes[2], axes[1], axes[0], indexing='ij')
+    points = np.column_stack([x.ravel(), y.ravel(), z.ravel()])
+
+    def p(i, j, k):
+        return i + (nx + 1) * (j + (ny + 1) * k)
+
+    k, j, i = (a.ravel() for a in np.meshgrid(np.arange(nz), np.arange(ny), np.arange(nx), indexing='ij'))
+    cells = i + nx * (j + ny * k)
+    # faces towards the +x, +y and +z neighbour of every cell, normals pointing from owner to neighbour
+    plus_faces = [
+        (i < nx - 1, cells + 1, np.stack([p(i + 1, j, k), p(i + 1, j + 1, k), p(i + 1, j + 1, k + 1), p(i + 1, j, k + 1)], 1)),
+        (j < ny - 1, cells + nx, np.stack([p(i, j + 1, k), p(i, j + 1, k + 1), p(i + 1, j + 1, k + 1), p(i + 1, j + 1, k)], 1)),
+        (k < nz - 1, cells + nx * ny, np.stack([p(i, j, k + 1), p(i + 1, j, k + 1), p(i + 1, j + 1, k + 1), p(i, j + 1, k + 1)], 1)),
+    ]
+    # internal faces ordered by owner, then neighbour (upper-triangular order)
+    internal_owner = np.concatenate([cells[m] for m, _, _ in plus_faces])
+    internal_neighbour = np.concatenate([n[m] for m, n, _ in plus_faces])
+    internal_faces = np.concatenate([f[m] for m, _, f in plus_faces])
+    order = np.lexsort((internal_neighbour, internal_owner))
+    faces, owner = [internal_faces[order]], [internal_owner[order]]
+    neighbour = internal_neighbour[order]
+
+    index = (i, j, k)
+    size = (nx, ny, nz)
+    boundary = []
+    start = len(neighbour)
+    for name, (axis, side) in patches.items():
+        on_patch = index[axis] == (size[axis] - 1 if side == 'max' else 0)
+        _, _, plus = plus_faces[axis]
+        patch_faces = plus[on_patch]
+        if side == 'min':
+            # the +axis face of the first layer, moved down to the lower side and reversed to point outwards
+            shift = [1, nx + 1, (nx + 1) * (ny + 1)][axis]
+            patch_faces = patch_faces[:, ::-1] - shift
+        faces.append(patch_faces)
+        owner.append(cells[on_patch])
+        boundary.append((name, start, len(patch_faces)))
+        start += len(patch_faces)
+    return points, np.concatenate(faces), np.concatenate(owner), neighbour, boundary
+
+
+def cell_centres(case: Path) -> np.ndarray:
+    lower, upper, (nx, ny, nz), _ = block_mesh_spec(case)
+    axes = [lower[d] + (np.arange(n) + 0.5) * (upper[d] - lower[d]) / n for d, n in enumerate((nx, ny, nz))]
+    z, y, x = np.meshgrid(axes[2], axes[1], axes[0], indexing='ij')
+    return np.column_stack([x.ravel(), y.ravel(), z.ravel()])
+
+
+def block_mesh():
+    banner('blockMesh')
+    case = Path.cwd()
+    print('Creating block mesh from "system/blockMeshDict"')
+    points, faces, owner, neighbour, boundary = structured_mesh(case)
+    n_cells = int(owner.max()) + 1
+    mesh_dir = case / 'constant' / 'polyMesh'
+    mesh_dir.mkdir(parents=True, exist_ok=True)
+
+    note = f'nPoints:{len(points)}  nCells:{n_cells}  nFaces:{len(faces)}  nInternalFaces:{len(neighbour)}'
+    write_list(mesh_dir / 'points', foam_header('vectorField', 'constant/polyMesh', 'points'),
+               [f'({x:g} {y:g} {z:g})' for x, y, z in points])
+    write_list(mesh_dir / 'faces', foam_header('faceList', 'constant/polyMesh', 'faces'),
+               [f'4({a} {b} {c} {d})' for a, b, c, d in faces])
+    write_list(mesh_dir / 'owner', foam_header('labelList', 'constant/polyMesh', 'owner', note),
+               [str(c) for c in owner])
+    write_list(mesh_dir / 'neighbour', foam_header('labelList', 'constant/polyMesh', 'neighbour', note),
+               [str(c) for c in neighbour])
+    write_list(mesh_dir / 'boundary', foam_header('polyBoundaryMesh', 'constant/polyMesh', 'boundary'), [
+        f'{name}\n{{\n    type wall;\n    inGroups 1(wall);\n    nFaces {n};\n    startFace {start};\n}}'
+        for name, start, n in boundary
+    ])
+
+    print('Writing polyMesh')
+    print('----------------')
+    print('Mesh Information')
+    print('----------------')
+    print(f'  nPoints: {len(points)}')
+    print(f'  nCells: {n_cells}')
+    print(f'  nFaces: {len(faces)}')
+    print(f'  nInternalFaces: {len(neighbour)}')
+    print('----------------')
+    print('Patches')
+    print('----------------')
+    for patch, (name, start, n) in enumerate(boundary):
+        print(f'  patch {patch} (start: {start} size: {n}) name: {name}')
+    print()
+    footer()
+
+
+def surface_feature_extract():
+    banner('surfaceFeatureExtract')
+    for stl in sorted((Path.cwd() / 'constant' / 'triSurface').glob('*.stl')):
+        print(f'Surface            : "{stl.name}"')
+        print(f'Extracting edges from "{stl.name}" using included angle 150')
+        print(f'Writing featureEdgeMesh to "constant/extendedFeatureEdgeMesh/{stl.stem}.extendedFeatureEdgeMesh"')
+        print()
+    footer()
+
+
+def snappy_hex_mesh():
+    banner('snappyHexMesh')
+    owner = (Path.cwd() / 'constant' / 'polyMesh' / 'owner').read_text(errors='ignore')[:4096]
+    n_cells = int(re.search(r'nCells:\s*(\d+)', owner).group(1))
+    for phase in ('Refinement phase', 'Splitting processor domains', 'Morphing phase', 'Layer addition phase'):
+        print(phase)
+        print('-' * len(phase))
+        print()
+    print(f'Mesh  : cells:{n_cells}  faces:{n_cells * 3}  points:{n_cells}')
+    print(f'Finished meshing in = {time.perf_counter() - START:.2f} s.')
+    footer()
+
+
+def strip_header(text: str) -> str:
+    """The dictionary without its FoamFile header."""
+    return re.sub(r'^FoamFile\s*\{[^}]*\}', '', text, count=1, flags=re.MULTILINE)
+
+
+def initial_boundary_field(field_file: Path) -> dict[str, str]:
+    """Patch name (or pattern) to the body of its entry in the boundaryField of an initial field file."""
+    if not field_file.is_file():
+        return {}
+    boundary_field = strip_header(field_file.read_text()).split('boundaryField', 1)[-1]
+    return dict(re.findall(r'^    ("[^"]*"|\S+)\s*\n    \{\n(.*?)^    \}', boundary_field, re.MULTILINE | re.DOTALL))
+
+
+def write_result_fields(case: Path, time_name: str, iteration: int, end_time: int):
+    """
+    Smooth synthetic fields: a hot plume over the middle of the room that grows with the iterations. Like the real
+    solver, the boundaryField keeps the boundary conditions of the initial field with $internalField expanded, and
+    covers the object patches the initial fields define, as in a real run whose mesh snappyHexMesh gave those
+    patches. Mesh patches without a boundary condition are written as calculated.
+    """
+    boundary = strip_header((case / 'constant' / 'polyMesh' / 'boundary').read_text())
+    patches = re.findall(r'^(\w+)\s*\n\{', boundary, re.MULTILINE)
+    centres = cell_centres(case)
+    span = centres.max(axis=0) - centres.min(axis=0) + 1e-9
+    r = np.linalg.norm((centres - centres.mean(axis=0)) / span, axis=1)
+    progress = min(1.0, iteration / max(end_time, 1))
+    fields = {
+        'T': ('volScalarField', '[0 0 0 1 0 0 0]', 295.15 + 10 * progress * np.exp(-8 * r ** 2)),
+        'p_rgh': ('volScalarField', '[1 -1 -2 0 0 0 0]', 101325 - 11.8 * centres[:, 2]),
+        'U': ('volVectorField', '[0 1 -1 0 0 0 0]', np.column_stack([
+            0.3 * np.sin(np.pi * centres[:, 1] / span[1]), 0.2 * np.cos(np.pi * centres[:, 0] / span[0]),
+            0.5 * progress * np.exp(-8 * r ** 2),
+        ])),
+    }
+    time_dir = case / time_name
+    time_dir.mkdir(exist_ok=True)
+    for name, (cls, dimensions, values) in fields.items():
+        if values.ndim == 1:
+            kind, rows, uniform = 'scalar', [f'{v:g}' for v in values], f'{values.mean():g}'
+        else:
+            kind = 'vector'
+            rows = [f'({a:g} {b:g} {c:g})' for a, b, c in values]
+            uniform = '({:g} {:g} {:g})'.format(*values.mean(axis=0))
+        entries = {
+            patch: body.replace('$internalField', f'uniform {uniform}')
+            for patch, body in initial_boundary_field(case / '0' / name).items()
+        }
+        for patch in patches:
+            entries.setdefault(patch, f'        type calculated;\n        value uniform {uniform};\n')
+        boundary_field = ''.join(f'    {patch}\n    {{\n{body}    }}\n' for patch, body in entries.items())
+        (time_dir / name).write_text(
+            foam_header(cls, time_name, name)
+            + f'dimensions {dimensions};\n\n'
+            + f'internalField nonuniform List<{kind}> {len(rows)}\n(\n' + '\n'.join(rows) + '\n)\n;\n\n'
+            + 'boundaryField\n{\n' + boundary_field + '}\n'
+        )
+
+
+def buoyant_simple_foam():
+    """
+    Iterates with exponentially decaying residuals, checking the controlDict for a stop request like a
+    runTimeModifiable run does, and writes the fields at every writeInterval, on stopAt writeNow and at endTime.
+    """
+    banner('buoyantSimpleFoam')
+    case = Path.cwd()
+    control_dict = case / 'system' / 'controlDict'
+    end_time = int(float(read_entry(control_dict, 'endTime', '1000')))
+    write_interval = int(float(read_entry(control_dict, 'writeInterval', str(end_time))))
+    purge_write = int(read_entry(control_dict, 'purgeWrite', '0'))
+    start = 0
+    if read_entry(control_dict, 'startFrom') == 'latestTime':
+        times = [float(p.name) for p in case.iterdir() if p.is_dir() and re.fullmatch(NUMBER, p.name)]
+        start = int(max(times, default=0))
+
+    written = []
+
+    def write(iteration):
+        write_result_fields(case, f'{iteration:g}', iteration, end_time)
+        written.append(iteration)
+        if purge_write > 0:
+            while len(written) > purge_write:
+                old = case / f'{written.pop(0):g}'
+                for f in old.iterdir():
+                    f.unlink()
+                old.rmdir()
+
+    print('Starting time loop')
+    print()
+    max_t = 295.15
+    for iteration in range(start + 1, end_time + 1):
+        decay = math.exp(-iteration / 70)
+        print(f'Time = {iteration}')
+        print()
+        for field, scale in (('Ux', 0.3), ('Uy', 0.3), ('Uz', 0.5), ('h', 0.2), ('k', 0.1), ('epsilon', 0.1)):
+            print(f'smoothSolver:  Solving for {field}, Initial residual = {scale * decay:.6g}, '
+                  f'Final residual = {scale * decay * 0.05:.6g}, No Iterations 2')
+        print(f'GAMG:  Solving for p_rgh, Initial residual = {0.8 * decay:.6g}, '
+              f'Final residual = {0.008 * decay:.6g}, No Iterations 7')
+        max_t = 305.15 - 10 * decay
+        print('fieldMinMax monitor write:')
+        print(f'    min(T) = 295.15 in cell 0 at location (0 0 0)')
+        print(f'    max(T) = {max_t:.6g} in cell 1 at location (1 1 1)')
+        print(f'ExecutionTime = {time.perf_counter() - START:.2f} s  ClockTime = {math.ceil(time.perf_counter() - START)} s')
+        # the supervisor reads the log while the solver runs
+        print(flush=True)
+        if SECONDS_PER_ITERATION:
+            time.sleep(SECONDS_PER_ITERATION)
+
+        if iteration % 25 == 0 and read_entry(control_dict, 'stopAt') == 'writeNow':
+            write(iteration)
+            break
+        if iteration % write_interval == 0 or iteration == end_time:
+            write(iteration)
+    footer()
+
+
+
+def read_internal_field(field_file: Path) -> np.ndarray:
+    """The nonuniform internalField the solver stand-in writes, one row per cell."""
+    kind, body = re.search(
+        r'internalField\s+nonuniform\s+List<(\w+)>\s*\d+\s*\((.*?)\n\)', field_file.read_text(), re.DOTALL
+    ).groups()
+    values = np.array(body.replace('(', ' ').replace(')', ' ').split(), dtype=float)
+    return values if kind == 'scalar' else values.reshape(-1, 3)
+
+
+def nearest_cells(source: Path, target: Path) -> np.ndarray:
+    """Index of the source cell nearest to every target cell, both structured stand-in meshes."""
+    lower, upper, counts, _ = block_mesh_spec(source)
+    centres = cell_centres(target)
+    index = np.zeros(len(centres), dtype=int)
+    stride = 1
+    for d, n in enumerate(counts):
+        cell = ((centres[:, d] - lower[d]) * n / (upper[d] - lower[d])).astype(int)
+        index += stride * np.clip(cell, 0, n - 1)
+        stride *= n
+    return index
+
+
+def map_fields():
+    """mapFields <sourceCase> -consistent -sourceTime latestTime: writes the source solution into the target's 0/."""
+    banner('mapFields')
+    case = Path.cwd()
+    source = Path(sys.argv[1])
+    times = sorted((float(p.name), p) for p in source.iterdir() if p.is_dir() and re.fullmatch(NUMBER, p.name))
+    source_time = times[-1][1]
+    print(f'Source: "{source.parent}" "{source.name}"')
+    print(f'Target: "{case.parent}" "{case.name}"')
+    print()
+    print(f'Mapping fields for time {source_time.name}')
+    print()
+
+    index = nearest_cells(source, case)
+    for source_field in sorted(source_time.iterdir()):
+        target_field = case / '0' / source_field.name
+        if not target_field.is_file():
+            continue
+        print(f'    interpolating {source_field.name}')
+        values = read_internal_field(source_field)[index]
+        if values.ndim == 1:
+            kind, rows = 'scalar', [f'{v:g}' for v in values]
+        else:
+            kind, rows = 'vector', [f'({a:g} {b:g} {c:g})' for a, b, c in values]
+        internal_field = f'internalField nonuniform List<{kind}> {len(rows)}\n(\n' + '\n'.join(rows) + '\n)\n;'
+        text = target_field.read_text()
+        # the initial fields may be written in binary, the mapped list is ascii
+        text = re.sub(r'^(\s*format\s+)binary;', r'\1ascii;', text, count=1, flags=re.MULTILINE)
+        text = re.sub(r'^internalField\s[^;]*;', lambda _: internal_field, text, count=1, flags=re.MULTILINE)
+        target_field.write_text(text)
+    print()
+    footer()
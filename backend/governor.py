@@ -0,0 +1,116 @@
+import os
+import threading
+from pathlib import Path
+
+# Thread pool sizes read by the OpenMP runtime and the BLAS/LAPACK builds numpy, torch and OpenCV link against.
+THREAD_ENV_VARS = (
+    'OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS', 'BLIS_NUM_THREADS', 'VECLIB_MAXIMUM_THREADS',
+    'NUMEXPR_NUM_THREADS',
+)
+# Cores kept for the web server and DINOv2 inference, never handed to simulation jobs.
+WEB_CORES = int(os.environ.get('SIMULATION_WEB_CORES', '1'))
+
+
+# The cores the cgroup (container) may run on, cgroup v2 and v1.
+CPUSET_FILES = (
+    Path('/sys/fs/cgroup/cpuset.cpus.effective'), Path('/sys/fs/cgroup/cpuset/cpuset.effective_cpus'),
+)
+
+
+def parse_cpu_list(cpu_list: str) -> list[int]:
+    """The cores of a kernel cpu list such as '0-3,8,10-11'."""
+    cores = []
+    for part in cpu_list.strip().split(','):
+        if part:
+            first, _, last = part.partition('-')
+            cores.extend(range(int(first), int(last or first) + 1))
+    return sorted(cores)
+
+
+def available_cores() -> list[int]:
+    """
+    The cores of the machine, or of the container's cpuset. Not this process' affinity: a process started by the web
+    process (e.g. the server under the debug reloader) inherits its pinning to the web cores.
+    """
+    for path in CPUSET_FILES:
+        try:
+            cores = parse_cpu_list(path.read_text())
+        except (OSError, ValueError):
+            continue
+        if cores:
+            return cores
+    return list(range(os.cpu_count() or 1))
+
+
+MACHINE_CORES = available_cores()
+
+
+def split_cores(cores: list[int], web_cores: int = WEB_CORES, cores_per_job: int = 1) -> tuple[list[int], list[int]]:
+    """
+    (web, job) core sets. The first web_cores cores serve the web process; when the rest can not hold a single job,
+    jobs share every core instead.
+    """
+    web, jobs = cores[:web_cores], cores[web_cores:]
+    if len(jobs) < cores_per_job:
+        return web or cores, cores
+    return web, jobs
+
+
+def pin_web_process(web_cores: list[int]):
+    """Keeps the web process, and every thread it starts from now on, on web_cores with thread pools to match."""
+    os.sched_setaffinity(0, web_cores)
+    limit_threads(len(web_cores))
+
+
+def limit_threads(n: int):
+    """
+    Caps the OpenMP and BLAS thread pools at n threads. Only libraries loaded after the call (and child processes)
+    see the limit, so the web process calls this before importing numpy or torch.
+    """
+    for var in THREAD_ENV_VARS:
+        os.environ[var] = str(n)
+
+
+def pin(cores: list[int]):
+    """
+    Restricts this process and everything it starts to the given cores. OpenFOAM parallelizes through MPI ranks only,
+    so every process is single-threaded.
+    """
+    os.sched_setaffinity(0, cores)
+    limit_threads(1)
+
+
+class CoreAllocator:
+    """Hands out disjoint sets of cores_per_job cores to running jobs."""
+
+    def __init__(self, cores: list[int], cores_per_job: int):
+        self.cores = list(cores)
+        self.cores_per_job = cores_per_job
+        self.free = list(cores)
+        self.allocated: dict[str, list[int]] = {}
+        self.lock = threading.Lock()
+
+    @property
+    def capacity(self) -> int:
+        return max(1, len(self.cores) // self.cores_per_job)
+
+    def allocate(self, run_id: str) -> list[int] | None:
+        """The cores of run_id, or None when fewer than cores_per_job are free."""
+        with self.lock:
+            if len(self.free) < min(self.cores_per_job, len(self.cores)):
+                return None
+            cores, self.free = self.free[:self.cores_per_job], self.free[self.cores_per_job:]
+            self.allocated[run_id] = cores
+            return cores
+
+    def claim(self, run_id: str, cores: list[int]) -> list[int]:
+        """Books the free ones of the given cores for run_id, a job that was pinned to them elsewhere. Returns them."""
+        with self.lock:
+            cores = [core for core in self.free if core in cores]
+            self.free = [core for core in self.free if core not in cores]
+            self.allocated[run_id] = cores
+            return cores
+
+    def release(self, run_id: str):
+        with self.lock:
+            self.free = sorted(self.free + self.allocated.pop(run_id, []))
@@ -0,0 +1,319 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    run_id TEXT PRIMARY KEY,
+    kind TEXT,
+    status TEXT NOT NULL,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    params TEXT,
+    result_dir TEXT,
+    progress TEXT,
+    config_hash TEXT,
+    cancel_requested REAL,
+    owner TEXT,
+    launcher TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status);
+CREATE INDEX IF NOT EXISTS jobs_created ON jobs (created);
+"""
+# Added after the first release, applied to registries created without them.
+MIGRATIONS = {
+    'config_hash': 'ALTER TABLE jobs ADD COLUMN config_hash TEXT',
+    'cancel_requested': 'ALTER TABLE jobs ADD COLUMN cancel_requested REAL',
+    'owner': 'ALTER TABLE jobs ADD COLUMN owner TEXT',
+    'launcher': 'ALTER TABLE jobs ADD COLUMN launcher TEXT',
+}
+INDEXES = 'CREATE INDEX IF NOT EXISTS jobs_config_hash ON jobs (config_hash);'
+
+FINAL_STATUSES = ('completed', 'failed', 'cancelled')
+# Jobs that have not finished yet.
+ACTIVE_STATUSES = ('created', 'queued', 'running', 'running_optimization')
+# Jobs whose result can be handed out for an identical request: finished or on their way.
+REUSABLE_STATUSES = ('completed', *ACTIVE_STATUSES)
+# Jobs that can still be cancelled.
+CANCELLABLE_STATUSES = (*ACTIVE_STATUSES, 'resuming')
+BOOT_ID_FILE = Path('/proc/sys/kernel/random/boot_id')
+
+
+def process_stat(pid: int) -> list[str] | None:
+    """
+    The fields of /proc/<pid>/stat after the command name, starting with the state (so the parent pid is [1] and the
+    start time [19]). None when the process does not exist.
+    """
+    try:
+        # the command name is in parentheses and may itself contain spaces or parentheses
+        return Path(f'/proc/{pid}/stat').read_text().rsplit(')', 1)[1].split()
+    except (OSError, IndexError):
+        return None
+
+
+def process_start_time(pid: int) -> str | None:
+    """Start time of a process in clock ticks since boot, None when it does not exist or has exited."""
+    stat = process_stat(pid)
+    # a zombie has exited, it only waits for its parent to collect the exit status
+    if stat is None or len(stat) < 20 or stat[0] == 'Z':
+        return None
+    return stat[19]
+
+
+def process_identity(pid: int | None = None) -> str:
+    """Boot id, pid and start time of a process (default: this one), which no other process will ever share."""
+    pid = os.getpid() if pid is None else pid
+    return f'{BOOT_ID_FILE.read_text().strip()}:{pid}:{process_start_time(pid)}'
+
+
+def process_alive(identity: str | None) -> bool:
+    """Whether the process of a process_identity still runs. A reused pid has a different start time."""
+    if identity is None:
+        return False
+    boot_id, pid, start_time = identity.rsplit(':', 2)
+    return boot_id == BOOT_ID_FILE.read_text().strip() and process_start_time(int(pid)) == start_time
+
+
+class JobRegistry:
+    """
+    Durable job records in SQLite (WAL mode), so readers never block the writers and every process, gunicorn worker
+    or restart sees the same jobs. Behaves like the old status dict: registry[run_id] is the status string.
+    """
+
+    def __init__(self, path: str | Path):
+        # absolute, because jobs change directory (the GA runs in its temp dir) before their first write
+        self.path = Path(path).resolve()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._conn.executescript(SCHEMA)
+        columns = {row['name'] for row in self._conn.execute('PRAGMA table_info(jobs)')}
+        for column, statement in MIGRATIONS.items():
+            if column not in columns:
+                self._conn.execute(statement)
+        self._conn.executescript(INDEXES)
+        self.progress = ProgressView(self)
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # one connection per thread and process: sqlite connections must not cross either
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            local.conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            local.conn.row_factory = sqlite3.Row
+            local.conn.execute('PRAGMA journal_mode=WAL')
+            local.conn.execute('PRAGMA synchronous=NORMAL')
+            local.pid = os.getpid()
+        return local.conn
+
+    def __getstate__(self):
+        return {'path': self.path}
+
+    def __setstate__(self, state):
+        self.path = state['path']
+        self._local = threading.local()
+        self.progress = ProgressView(self)
+
+    def create(self, run_id: str, kind: str, params: dict | None = None, result_dir: str | None = None):
+        now = time.time()
+        self._conn.execute(
+            'INSERT INTO jobs (run_id, kind, status, created, updated, params, result_dir, owner) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (run_id, kind, 'created', now, now, json.dumps(params), result_dir, process_identity())
+        )
+
+    def claim(self, run_id: str, kind: str, config_hash: str, params: dict | None = None,
+              result_dir: str | None = None) -> tuple[str, str | None]:
+        """
+        Atomically finds a completed or in-flight job with this config hash, or creates run_id for it. Returns
+        (run_id, status) of the existing job, or (run_id, None) when the caller owns the new one and must start it.
+        """
+        conn = self._conn
+        # IMMEDIATE takes the write lock up front, so two identical requests can not both miss and insert
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                f"""
+                SELECT run_id, status FROM jobs
+                WHERE config_hash = ? AND status IN ({', '.join('?' * len(REUSABLE_STATUSES))})
+                    AND cancel_requested IS NULL
+                ORDER BY status = 'completed' DESC, created DESC LIMIT 1
+                """,
+                (config_hash, *REUSABLE_STATUSES)
+            ).fetchone()
+            if row is None:
+                now = time.time()
+                conn.execute(
+                    'INSERT INTO jobs (run_id, kind, status, created, updated, params, result_dir, config_hash, owner) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (run_id, kind, 'created', now, now, json.dumps(params), result_dir, config_hash,
+                     process_identity())
+                )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return (run_id, None) if row is None else (row['run_id'], row['status'])
+
+    def request_cancel(self, run_id: str) -> bool:
+        """
+        Flags an unfinished job for cancellation. The worker process whose queue runs the job picks the flag up (see
+        JobQueue), so any worker can take the request. Returns False when the job has already finished.
+        """
+        now = time.time()
+        placeholders = ', '.join('?' * len(CANCELLABLE_STATUSES))
+        cursor = self._conn.execute(
+            f'UPDATE jobs SET cancel_requested = ?, updated = ? WHERE run_id = ? AND status IN ({placeholders})',
+            (now, now, run_id, *CANCELLABLE_STATUSES)
+        )
+        return cursor.rowcount > 0
+
+    def cancel_requests(self) -> list[str]:
+        """Unfinished jobs flagged by request_cancel."""
+        placeholders = ', '.join('?' * len(CANCELLABLE_STATUSES))
+        rows = self._conn.execute(
+            f'SELECT run_id FROM jobs WHERE cancel_requested IS NOT NULL AND status IN ({placeholders})',
+            CANCELLABLE_STATUSES
+        )
+        return [row['run_id'] for row in rows]
+
+    def set_owner(self, run_id: str, pid: int | None = None):
+        """
+        Records the process answerable for an unfinished job: the server process that queued it, then the job process
+        running it (default: this process). The calling process, whose queue holds the job, is its launcher.
+        """
+        self._conn.execute(
+            'UPDATE jobs SET owner = ?, launcher = ? WHERE run_id = ?',
+            (process_identity(pid), process_identity(), run_id)
+        )
+
+    def take_interrupted(self) -> list[dict]:
+        """
+        Unfinished jobs whose owner process is gone (see set_owner), for this process to run again. Jobs whose job
+        process survived a restart of the server process that started it keep running and are left alone. The jobs
+        taken are moved to the 'resuming' status and owned by this process atomically, so only one process picks
+        each of them up.
+        """
+        conn = self._conn
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            placeholders = ', '.join('?' * len(CANCELLABLE_STATUSES))
+            rows = conn.execute(
+                f'SELECT * FROM jobs WHERE status IN ({placeholders}) ORDER BY created', CANCELLABLE_STATUSES
+            ).fetchall()
+            rows = [row for row in rows if not process_alive(row['owner'])]
+            now = time.time()
+            owner = process_identity()
+            conn.executemany(
+                'UPDATE jobs SET status = ?, updated = ?, owner = ? WHERE run_id = ?',
+                [('resuming', now, owner, row['run_id']) for row in rows]
+            )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return [self._to_dict(row) for row in rows]
+
+    def take_orphans(self) -> list[dict]:
+        """
+        Running jobs whose job process survived the server process that launched it, for the queue of this process to
+        adopt: no queue knows them otherwise, so nothing would carry out their cancellation or account for their cores.
+        The jobs taken are launched by this process from now on, atomically, so only one process adopts each of them.
+        """
+        conn = self._conn
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            placeholders = ', '.join('?' * len(ACTIVE_STATUSES))
+            # a job process owns its job, its launcher is the server process that started it (see JobQueue)
+            rows = conn.execute(
+                f'SELECT * FROM jobs WHERE status IN ({placeholders}) AND launcher IS NOT NULL AND owner != launcher '
+                'ORDER BY created',
+                ACTIVE_STATUSES
+            ).fetchall()
+            rows = [row for row in rows if process_alive(row['owner']) and not process_alive(row['launcher'])]
+            conn.executemany(
+                'UPDATE jobs SET launcher = ? WHERE run_id = ?', [(process_identity(), row['run_id']) for row in rows]
+            )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return [self._to_dict(row) for row in rows]
+
+    def __setitem__(self, run_id: str, status: str):
+        now = time.time()
+        self._conn.execute(
+            f"""
+            INSERT INTO jobs (run_id, status, created, updated) VALUES (?, ?, ?, ?)
+            ON CONFLICT (run_id) DO UPDATE SET
+                status = excluded.status,
+                updated = excluded.updated,
+                started = CASE WHEN started IS NULL AND excluded.status LIKE 'running%' THEN excluded.updated
+                               ELSE started END,
+                finished = CASE WHEN excluded.status IN ({', '.join('?' * len(FINAL_STATUSES))}) THEN excluded.updated ELSE finished END
+            """,
+            (run_id, status, now, now, *FINAL_STATUSES)
+        )
+
+    def __getitem__(self, run_id: str) -> str:
+        row = self._conn.execute('SELECT status FROM jobs WHERE run_id = ?', (run_id,)).fetchone()
+        if row is None:
+            raise KeyError(run_id)
+        return row['status']
+
+    def __contains__(self, run_id: str) -> bool:
+        return self._conn.execute('SELECT 1 FROM jobs WHERE run_id = ?', (run_id,)).fetchone() is not None
+
+    def get(self, run_id: str, default=None):
+        try:
+            return self[run_id]
+        except KeyError:
+            return default
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> dict:
+        record = dict(row)
+        for key in ('params', 'progress'):
+            if record.get(key) is not None:
+                record[key] = json.loads(record[key])
+        return record
+
+    def record(self, run_id: str) -> dict | None:
+        row = self._conn.execute('SELECT * FROM jobs WHERE run_id = ?', (run_id,)).fetchone()
+        return self._to_dict(row) if row is not None else None
+
+    def list(self, status: str | None = None, limit: int = 100, offset: int = 0) -> list[dict]:
+        """Newest jobs first, without their parameters."""
+        columns = 'run_id, kind, status, created, updated, started, finished, result_dir, config_hash'
+        if status is None:
+            rows = self._conn.execute(
+                f'SELECT {columns} FROM jobs ORDER BY created DESC LIMIT ? OFFSET ?', (limit, offset)
+            )
+        else:
+            rows = self._conn.execute(
+                f'SELECT {columns} FROM jobs WHERE status = ? ORDER BY created DESC LIMIT ? OFFSET ?',
+                (status, limit, offset)
+            )
+        return [dict(row) for row in rows]
+
+
+class ProgressView:
+    """The progress column of a JobRegistry as a mapping of run_id to the latest progress snapshot."""
+
+    def __init__(self, registry: JobRegistry):
+        self.registry = registry
+
+    def __setitem__(self, run_id: str, progress: dict):
+        self.registry._conn.execute(
+            'UPDATE jobs SET progress = ?, updated = ? WHERE run_id = ?', (json.dumps(progress), time.time(), run_id)
+        )
+
+    def get(self, run_id: str, default=None):
+        row = self.registry._conn.execute('SELECT progress FROM jobs WHERE run_id = ?', (run_id,)).fetchone()
+        if row is None or row['progress'] is None:
+            return default
+        return json.loads(row['progress'])
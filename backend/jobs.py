@@ -0,0 +1,258 @@
+import multiprocessing
+import os
+import queue
+import shutil
+import signal
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+from governor import MACHINE_CORES, CoreAllocator, pin, split_cores
+from job_registry import FINAL_STATUSES, process_alive, process_stat
+from simulation_runner import N_PROCS
+
+
+def default_allocator() -> CoreAllocator:
+    """N_PROCS cores per job out of the cores not kept for the web process."""
+    _, job_cores = split_cores(MACHINE_CORES, cores_per_job=N_PROCS)
+    return CoreAllocator(job_cores, N_PROCS)
+
+
+def descendants(pid: int) -> list[int]:
+    """All processes below pid, found by walking the parent links in /proc."""
+    children: dict[int, list[int]] = {}
+    for proc in Path('/proc').glob('[0-9]*'):
+        stat = process_stat(int(proc.name))
+        if stat is None:
+            continue
+        children.setdefault(int(stat[1]), []).append(int(proc.name))
+
+    res = []
+    stack = [pid]
+    while stack:
+        for child in children.get(stack.pop(), []):
+            res.append(child)
+            stack.append(child)
+    return res
+
+
+def signal_tree(pid: int, pids: set[int], sig: int):
+    # the job leads its own process group (see run_job); MPI launchers may start further groups, hence the pid list
+    try:
+        os.killpg(pid, sig)
+    except (ProcessLookupError, PermissionError):
+        pass
+    for child in pids:
+        try:
+            os.kill(child, sig)
+        except ProcessLookupError:
+            pass
+
+
+def kill_tree(process, grace: float = 5.0):
+    """Terminates a job process with its solvers and MPI ranks: SIGTERM first, SIGKILL after the grace period."""
+    # children are re-parented to init once the job dies, so the tree has to be collected before signalling
+    pids = set(descendants(process.pid))
+    signal_tree(process.pid, pids, signal.SIGTERM)
+    process.join(grace)
+    deadline = time.monotonic() + grace
+    while time.monotonic() < deadline and any(Path(f'/proc/{pid}').exists() for pid in pids):
+        time.sleep(0.1)
+    signal_tree(process.pid, pids, signal.SIGKILL)
+    process.join()
+
+
+def run_job(target, args, kwargs, cores=None):
+    """
+    Entry point of a job process. A new session makes the job and every process it starts one killable group, and
+    pinning keeps them all on the job's own cores.
+    """
+    os.setsid()
+    if cores is not None:
+        pin(cores)
+    target(*args, **kwargs)
+
+
+class AdoptedProcess:
+    """
+    Stands in for the multiprocessing.Process of a job adopted from a server process that died (see
+    JobRegistry.take_orphans). The job process is not a child of this one, so it is watched through its identity.
+    """
+
+    def __init__(self, identity: str):
+        self.identity = identity
+        self.pid = int(identity.rsplit(':', 2)[1])
+
+    def is_alive(self) -> bool:
+        return process_alive(self.identity)
+
+    @property
+    def exitcode(self) -> int | None:
+        # only the parent learns the exit status, so a finished job counts as failed unless it reported otherwise
+        return None if self.is_alive() else 1
+
+    def join(self, timeout: float | None = None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.is_alive() and (deadline is None or time.monotonic() < deadline):
+            time.sleep(0.1)
+
+
+class Job:
+    def __init__(self, run_id: str, target, args: tuple, kwargs: dict, status: str, scratch_dirs=(),
+                 resume_kwargs: dict | None = None):
+        self.run_id = run_id
+        self.target = target
+        self.args = args
+        self.kwargs = kwargs
+        # status set when the job leaves the queue
+        self.status = status
+        # removed when the job is cancelled
+        self.scratch_dirs = list(scratch_dirs)
+        # merged into kwargs when a crashed job is retried, None if the target can not resume
+        self.resume_kwargs = resume_kwargs
+        self.retries = 0
+        self.process: multiprocessing.Process | AdoptedProcess | None = None
+
+
+class JobQueue:
+    """
+    Bounded FIFO of simulation jobs. A dispatcher thread starts each job in its own process, pinned to a core set of
+    its own from the allocator, keeping at most max_workers of them running, so bursts of submissions wait in line
+    instead of oversubscribing the cores. The dispatcher also carries out the cancellations requested through the
+    registry for the jobs of this queue, whichever worker process took the request, and adopts the jobs left running
+    by a server process that died.
+    """
+
+    def __init__(self, simulations_db, max_workers: int | None = None, max_queued: int = 32, poll_interval=1.0,
+                 max_retries: int = 1, allocator: CoreAllocator | None = None):
+        self.simulations_db = simulations_db
+        self.allocator = allocator or default_allocator()
+        self.max_workers = max_workers or self.allocator.capacity
+        self.max_queued = max_queued
+        self.max_retries = max_retries
+        self.poll_interval = poll_interval
+
+        self.pending: deque[Job] = deque()
+        self.running: dict[str, Job] = {}
+        self.condition = threading.Condition()
+        self.dispatcher = threading.Thread(target=self._dispatch, name='job-dispatcher', daemon=True)
+        self.dispatcher.start()
+
+    def submit(self, run_id: str, target, args=(), kwargs=None, status='running', scratch_dirs=(),
+               resume_kwargs=None) -> int:
+        """
+        Queues a job and returns its 1-based queue position. Raises queue.Full when the queue is at capacity.
+        A job with resume_kwargs that crashes is retried (up to max_retries times) with them merged into its kwargs.
+        """
+        with self.condition:
+            if len(self.pending) >= self.max_queued:
+                raise queue.Full(f'{len(self.pending)} jobs are already waiting')
+            self.pending.append(Job(run_id, target, args, kwargs or {}, status, scratch_dirs, resume_kwargs))
+            self.simulations_db[run_id] = 'queued'
+            # waiting jobs live in this process only, another one takes them over if it dies
+            self.simulations_db.set_owner(run_id)
+            self.condition.notify()
+            return len(self.pending)
+
+    def position(self, run_id: str) -> int | None:
+        """1-based position of a waiting job, None once it has started (or is unknown)."""
+        with self.condition:
+            for i, job in enumerate(self.pending):
+                if job.run_id == run_id:
+                    return i + 1
+        return None
+
+    def cancel(self, run_id: str) -> bool:
+        """
+        Cancels a waiting or running job: kills its whole process tree, marks it 'cancelled' and removes its scratch
+        directories. Returns False when the job is not queued or running here, or has already finished.
+        """
+        with self.condition:
+            job = self.running.get(run_id)
+            if job is not None:
+                # a job that has just finished is left to _reap, its results must survive
+                if job.process.exitcode is not None or self.simulations_db.get(run_id) in FINAL_STATUSES:
+                    return False
+                del self.running[run_id]
+            else:
+                job = next((j for j in self.pending if j.run_id == run_id), None)
+                if job is None:
+                    return False
+                self.pending.remove(job)
+
+        if job.process is not None:
+            kill_tree(job.process)
+            self.allocator.release(run_id)
+            if self.simulations_db.get(run_id) == 'completed':
+                # it completed before the signal arrived
+                return False
+        # a runner caught mid-way may have reported 'failed' before it died
+        self.simulations_db[run_id] = 'cancelled'
+        for path in job.scratch_dirs:
+            shutil.rmtree(path, ignore_errors=True)
+        return True
+
+    def _cancel_requested(self):
+        with self.condition:
+            ours = {job.run_id for job in self.pending} | set(self.running)
+        for run_id in ours.intersection(self.simulations_db.cancel_requests()):
+            self.cancel(run_id)
+
+    def _adopt_orphans(self):
+        for record in self.simulations_db.take_orphans():
+            run_id = record['run_id']
+            job = Job(run_id, None, (), {}, record['status'])
+            job.process = AdoptedProcess(record['owner'])
+            try:
+                self.allocator.claim(run_id, sorted(os.sched_getaffinity(job.process.pid)))
+            except ProcessLookupError:
+                pass
+            self.running[run_id] = job
+
+    def stats(self) -> dict:
+        with self.condition:
+            return {
+                'queued': len(self.pending), 'running': len(self.running), 'workers': self.max_workers,
+                'cores': {run_id: cores for run_id, cores in self.allocator.allocated.items()},
+            }
+
+    def _reap(self):
+        for run_id, job in list(self.running.items()):
+            if job.process.is_alive():
+                continue
+            job.process.join()
+            del self.running[run_id]
+            self.allocator.release(run_id)
+            # a worker that died without reporting (e.g. killed by the OOM killer) must not stay 'running' forever
+            if job.process.exitcode != 0 and self.simulations_db.get(run_id) == job.status:
+                if job.resume_kwargs is not None and job.retries < self.max_retries:
+                    job.retries += 1
+                    job.kwargs = {**job.kwargs, **job.resume_kwargs}
+                    job.process = None
+                    self.pending.appendleft(job)
+                    self.simulations_db[run_id] = 'queued'
+                    self.simulations_db.set_owner(run_id)
+                else:
+                    self.simulations_db[run_id] = 'failed'
+
+    def _dispatch(self):
+        while True:
+            self._cancel_requested()
+            with self.condition:
+                self._adopt_orphans()
+                self._reap()
+                while self.pending and len(self.running) < self.max_workers:
+                    cores = self.allocator.allocate(self.pending[0].run_id)
+                    if cores is None:
+                        break
+                    job = self.pending.popleft()
+                    self.simulations_db[job.run_id] = job.status
+                    job.process = multiprocessing.Process(
+                        target=run_job, args=(job.target, job.args, job.kwargs, cores)
+                    )
+                    job.process.start()
+                    # the job process outlives this one (see run_job), so it owns the job from now on
+                    self.simulations_db.set_owner(job.run_id, job.process.pid)
+                    self.running[job.run_id] = job
+                self.condition.wait(self.poll_interval)
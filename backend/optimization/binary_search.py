@@ -1,6 +1,7 @@
+import shutil
 from pathlib import Path
 
-from simulation import Simulation
+from simulation.Simulation import Simulation
 
 
 class BinarySearchOptimizer:
@@ -13,7 +14,9 @@ class BinarySearchOptimizer:
             check_func,
             foam_case_dir='foam_case_binary_search',
             tol=None,
-            max_iters=None
+            max_iters=None,
+            sim_kwargs=None,
+            warm_start=True
     ):
         if tol is None and max_iters is None:
             raise ValueError("Either tol or max_iters must be specified")
@@ -26,15 +29,21 @@ class BinarySearchOptimizer:
         self.foam_case_dir = Path(foam_case_dir).absolute()
         self.tol = tol
         self.max_iters = max_iters
+        self.sim_kwargs = sim_kwargs or {}
+        self.warm_start = warm_start
 
         self.iters = 0
+        self.last_case_dir = None
 
     def next_iter(self):
         mid = (self.high + self.low) / 2
 
         updated = self.update_func(self.base, mid)
 
-        sim = Simulation(updated, self.foam_case_dir, overwrite=True)
+        # Each iteration gets its own case so the previous solution survives to warm-start the next one.
+        case_dir = self.foam_case_dir / f'iter_{self.iters}'
+        parent_case = self.last_case_dir if self.warm_start else None
+        sim = Simulation(updated, case_dir, overwrite=True, parent_case=parent_case, **self.sim_kwargs)
         sim.write_all()
         sim.run_all()
 
@@ -43,6 +52,10 @@ class BinarySearchOptimizer:
         else:
             self.high = mid
 
+        if self.last_case_dir is not None:
+            shutil.rmtree(self.last_case_dir, ignore_errors=True)
+        self.last_case_dir = case_dir
+
     def run(self):
         while self.max_iters is None or self.iters < self.max_iters:
             self.next_iter()
@@ -1,6 +1,8 @@
+import math
+
 import numpy as np
 
-from simulation import Simulation
+from simulation.Simulation import Simulation
 
 
 def crossover(parent1: list[int], parent2: list[int]):
@@ -15,17 +17,32 @@ class GAOptimizer:
             optim_dict: dict,
             mutation_scale: float,
             generations:int,
-            num_per_gen: int=1
+            num_per_gen: int=1,
+            sim_kwargs: dict | None = None,
+            warm_start: bool = True,
+            screening_kwargs: dict | None = None,
+            promote_fraction: float = 0.25
     ):
+        """
+        With screening_kwargs, every generation is first run with sim_kwargs updated by screening_kwargs (a coarse mesh
+        and loose convergence) and only the best promote_fraction of it is run again at full fidelity. Results are
+        (positions, max temperature, fidelity) with fidelity 'coarse' or 'full'.
+        """
         self.base: list[dict] = base
         self.optim_dict: dict = optim_dict
         self.num_per_gen: int = num_per_gen
         self.mutation_scale: float = mutation_scale
         self.generations: int = generations
+        self.sim_kwargs: dict = sim_kwargs or {}
+        self.warm_start: bool = warm_start
+        self.screening_kwargs: dict | None = screening_kwargs
+        self.promote_fraction: float = promote_fraction
 
         self.to_run: list[list[int]] = []
         self.changeable_dicts: list[dict] = []
-        self.results: list[tuple[list[int], float]] = []
+        self.results: list[tuple[list[int], float, str]] = []
+        # finished case per fidelity and layout; cases are only warm-started from cases of the same fidelity
+        self.case_dirs: dict[str, dict[tuple[int, ...], str]] = {'coarse': {}, 'full': {}}
 
         for name in optim_dict['objects']:
             for region in base:
@@ -57,39 +74,68 @@ class GAOptimizer:
                     self.to_run.append(positions)
                     added = True
 
-    def run(self, positions: list[int]):
+    def run(self, positions: list[int], fidelity: str = 'full') -> float:
         for (i, region) in enumerate(self.changeable_dicts):
             region.update(self.optim_dict['positions'][positions[i]])
 
         name = 'foam_case_' + '_'.join([str(i) for i in positions])
+        sim_kwargs = self.sim_kwargs
+        if fidelity == 'coarse':
+            name += '_coarse'
+            sim_kwargs = {**self.sim_kwargs, **self.screening_kwargs}
 
-        sim = Simulation(self.base, name)
+        sim = Simulation(self.base, name, parent_case=self.closest_case(positions, fidelity), **sim_kwargs)
         sim.write_all()
         sim.run_all()
-        self.results.append((positions, sim.get_results().max_temp()))
-        print(positions, sim.get_results().max_temp())
+        max_temp = sim.get_results().max_temp()
+        self.case_dirs[fidelity][tuple(positions)] = name
+        self.results.append((positions, max_temp, fidelity))
+        print(positions, max_temp, fidelity)
+        return max_temp
+
+    def closest_case(self, positions: list[int], fidelity: str = 'full'):
+        """Finished case whose layout differs from positions in the fewest racks, used to warm-start the solver."""
+        case_dirs = self.case_dirs[fidelity]
+        if not self.warm_start or not case_dirs:
+            return None
+        closest = min(
+            case_dirs.keys(),
+            key=lambda other: sum(a != b for a, b in zip(positions, other))
+        )
+        return case_dirs[closest]
 
     def run_generation(self):
-        for positions in self.to_run:
-            self.run(positions)
+        if self.screening_kwargs is None:
+            for positions in self.to_run:
+                self.run(positions)
+            return
+
+        screened = [(positions, self.run(positions, 'coarse')) for positions in self.to_run]
+        screened.sort(key=lambda x: x[1])
+        n_promoted = max(1, math.ceil(len(screened) * self.promote_fraction))
+        for positions, _ in screened[:n_promoted]:
+            self.run(positions, 'full')
 
     def next_generation(self):
         self.to_run = []
-        self.results.sort(key=lambda x: x[1], reverse=True)
-        weights = np.exp(-np.linspace(0, len(self.results), len(self.results), dtype=np.float32))
+        # every layout enters the selection once, with its most accurate temperature
+        full_layouts = {tuple(pos) for pos, _, fidelity in self.results if fidelity == 'full'}
+        parents_pool = [r for r in self.results if r[2] == 'full' or tuple(r[0]) not in full_layouts]
+        parents_pool.sort(key=lambda x: x[1], reverse=True)
+        weights = np.exp(-np.linspace(0, len(parents_pool), len(parents_pool), dtype=np.float32))
         weights = weights / weights.sum()
 
         for i in range(self.num_per_gen):
             added = False
             while not added:
                 parents = np.random.choice(
-                    np.arange(len(self.results)),
+                    np.arange(len(parents_pool)),
                     2,
                     replace=True,
                     p=weights
                 )
-                parent1 = self.results[parents[0]][0]
-                parent2 = self.results[parents[1]][0]
+                parent1 = parents_pool[parents[0]][0]
+                parent2 = parents_pool[parents[1]][0]
 
                 child: list[int] = crossover(parent1, parent2).tolist()
                 child = self.mutate(child)
@@ -98,7 +144,7 @@ class GAOptimizer:
                     if np.allclose(pos, child):
                         break
                 else:
-                    for pos, _ in self.results:
+                    for pos, _, _ in self.results:
                         if np.allclose(pos, child):
                             break
                     else:
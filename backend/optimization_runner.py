@@ -1,6 +1,7 @@
 # optimization_runner.py
 
 import json
+import math
 from functools import partial
 from pathlib import Path
 import os
@@ -8,10 +9,19 @@ import shutil
 from copy import deepcopy
 import numpy as np
 
-from simulation_runner import transform_config, run_openfoam_simulation
+from simulation_runner import (
+    estimate_simulation, mesh_kwargs, progress_publisher, simulation_kwargs, transform_config, run_openfoam_simulation
+)
 from optimization.binary_search import BinarySearchOptimizer, update_set_temp, check_max_temp
 from optimization.ga import GAOptimizer
-from simulation import Simulation
+from simulation.Simulation import Simulation
+from simulation.estimator import CostModel, combine_estimates
+from simulation.supervisor import ConvergenceCriteria
+
+BINARY_SEARCH_SETTINGS = {'low': 288.15, 'tol': 1.0, 'max_iters': 5}
+# Candidates are screened on a coarse mesh with loose convergence; the best quarter is re-run in full.
+GA_SETTINGS = {'mutation_scale': 10, 'generations': 5, 'num_per_gen': 4, 'promote_fraction': 0.25}
+
 
 def generate_ga_optim_input(config):
     """
@@ -76,7 +86,65 @@ def generate_ga_optim_input(config):
     }
 
 
-def run_binary_search_optimization(config, run_id, simulations_db):
+def convert_ga_to_sim_config(ga_config, px_to_meters=0.05):
+    """Converts the frontend's geometric GA config into the standard simulation config `transform_config` expects."""
+    sim_config = {}
+    room_contour = np.array(ga_config['room']['points'])
+    sim_config['room'] = {'dims': [(room_contour[:, 0].max() - room_contour[:, 0].min()) * px_to_meters, 
+                                   (room_contour[:, 1].max() - room_contour[:, 1].min()) * px_to_meters, 4.0]}
+
+    def convert_objects(category_name, default_height):
+        converted = []
+        for o in ga_config.get('objects', []):
+            if o['category'] == category_name:
+                bbox = o['bounding_box']
+                props = o.get('properties', {})
+                dims = [(bbox['x_max'] - bbox['x_min']) * px_to_meters, 
+                        (bbox['y_max'] - bbox['y_min']) * px_to_meters, 
+                        props.get('height', default_height)]
+                entry = {'name': o['name'], 'pos': [bbox['x_min'] * px_to_meters, bbox['y_min'] * px_to_meters, 0], 'dims': dims}
+                entry.update(props)
+                converted.append(entry)
+        return converted
+
+    sim_config['racks'] = convert_objects('Data Rack', 2.2)
+    sim_config['cracs'] = convert_objects('CRAC', 1.8)
+    sim_config['tiles'] = convert_objects('Perforated Tile', 0.01)
+    sim_config['physics'] = ga_config.get('physics', {})
+    sim_config['mesh'] = ga_config.get('mesh', {})
+    return sim_config
+
+
+def ga_screening_kwargs(progress_callback=None) -> dict:
+    """Simulation overrides for the GA's screening runs: a coarse mesh and loose convergence."""
+    return {
+        'refinement': 'coarse',
+        'convergence': ConvergenceCriteria(residual_tol=1e-3, monitor_tol=0.2, min_iterations=100),
+        'progress_callback': progress_callback,
+    }
+
+
+def estimate_binary_search(config, model: CostModel) -> dict:
+    """Cost of run_binary_search_optimization: at most max_iters searched runs plus the final simulation."""
+    regions = transform_config(config)
+    run = model.estimate(regions, **simulation_kwargs(output_profile='compact', **mesh_kwargs(config)))
+    final = estimate_simulation(config, model)
+    return combine_estimates([run] * BINARY_SEARCH_SETTINGS['max_iters'] + [final])
+
+
+def estimate_ga(config, model: CostModel) -> dict:
+    """Cost of run_ga_optimization: the baseline, every screened and promoted candidate, and the final simulation."""
+    regions = transform_config(convert_ga_to_sim_config(config))
+    sim_kwargs = simulation_kwargs(output_profile='compact', **mesh_kwargs(config))
+    full = model.estimate(regions, **sim_kwargs)
+    coarse = model.estimate(regions, **{**sim_kwargs, **ga_screening_kwargs()})
+    n_promoted = max(1, math.ceil(GA_SETTINGS['num_per_gen'] * GA_SETTINGS['promote_fraction']))
+    generation = [coarse] * GA_SETTINGS['num_per_gen'] + [full] * n_promoted
+    final = estimate_simulation(convert_ga_to_sim_config(config), model)
+    return combine_estimates([full] + generation * GA_SETTINGS['generations'] + [final])
+
+
+def run_binary_search_optimization(config, run_id, simulations_db, progress_db=None):
     run_path = Path('simulations', run_id)
     run_path.mkdir(parents=True, exist_ok=True)
     iteration_case_dir = run_path / 'bs_temp_case'
@@ -86,9 +154,15 @@ def run_binary_search_optimization(config, run_id, simulations_db):
         check_func = partial(check_max_temp, max_temp=target_max_temp)
         optim = BinarySearchOptimizer(
             base=base_sim_config,
-            low=288.15, high=target_max_temp,
+            low=BINARY_SEARCH_SETTINGS['low'], high=target_max_temp,
             update_func=update_set_temp, check_func=check_func,
-            foam_case_dir=iteration_case_dir, tol=1.0, max_iters=5
+            foam_case_dir=iteration_case_dir, tol=BINARY_SEARCH_SETTINGS['tol'],
+            max_iters=BINARY_SEARCH_SETTINGS['max_iters'],
+            sim_kwargs=simulation_kwargs(
+                output_profile='compact',
+                progress_callback=progress_publisher(progress_db, run_id, phase='binary_search'),
+                **mesh_kwargs(config)
+            )
         )
         optimal_temp = optim.run()
         result_data = {'optimal_crac_temp_K': optimal_temp, 'target_max_temp_K': target_max_temp}
@@ -97,7 +171,7 @@ def run_binary_search_optimization(config, run_id, simulations_db):
         final_config = deepcopy(config)
         final_config['physics']['crac_supply_temp_K'] = optimal_temp
 
-        run_openfoam_simulation(final_config, run_id, simulations_db, is_optimization_run=True)
+        run_openfoam_simulation(final_config, run_id, simulations_db, is_optimization_run=True, progress_db=progress_db)
 
         with open(run_path / 'optimization_result.json', 'w') as f:
             json.dump(result_data, f)
@@ -109,7 +183,7 @@ def run_binary_search_optimization(config, run_id, simulations_db):
             shutil.rmtree(iteration_case_dir)
 
 
-def run_ga_optimization(config, run_id, simulations_db):
+def run_ga_optimization(config, run_id, simulations_db, progress_db=None):
     # 'config' is the GA-style config: { "room": {"points":...}, "objects": [...] }
     run_path = Path('simulations', run_id)
     run_path.mkdir(parents=True, exist_ok=True)
@@ -119,34 +193,6 @@ def run_ga_optimization(config, run_id, simulations_db):
         # Step 1: Generate the GA-specific dictionary of possible rack positions.
         optim_dict = generate_ga_optim_input(config)
 
-        # Step 2: Define a robust helper function to convert the frontend's geometric config
-        # into the standard simulation config that `transform_config` expects.
-        def convert_ga_to_sim_config(ga_config, px_to_meters=0.05):
-            sim_config = {}
-            room_contour = np.array(ga_config['room']['points'])
-            sim_config['room'] = {'dims': [(room_contour[:, 0].max() - room_contour[:, 0].min()) * px_to_meters, 
-                                           (room_contour[:, 1].max() - room_contour[:, 1].min()) * px_to_meters, 4.0]}
-
-            def convert_objects(category_name, default_height):
-                converted = []
-                for o in ga_config.get('objects', []):
-                    if o['category'] == category_name:
-                        bbox = o['bounding_box']
-                        props = o.get('properties', {})
-                        dims = [(bbox['x_max'] - bbox['x_min']) * px_to_meters, 
-                                (bbox['y_max'] - bbox['y_min']) * px_to_meters, 
-                                props.get('height', default_height)]
-                        entry = {'name': o['name'], 'pos': [bbox['x_min'] * px_to_meters, bbox['y_min'] * px_to_meters, 0], 'dims': dims}
-                        entry.update(props)
-                        converted.append(entry)
-                return converted
-
-            sim_config['racks'] = convert_objects('Data Rack', 2.2)
-            sim_config['cracs'] = convert_objects('CRAC', 1.8)
-            sim_config['tiles'] = convert_objects('Perforated Tile', 0.01)
-            sim_config['physics'] = ga_config.get('physics', {})
-            return sim_config
-
         # Step 3: Create the standard config for the INITIAL layout and transform it to regions format.
         # This will be used for the baseline simulation AND to initialize the GA.
         initial_sim_config_standard = convert_ga_to_sim_config(config)
@@ -157,7 +203,12 @@ def run_ga_optimization(config, run_id, simulations_db):
         os.chdir(ga_temp_path)
         
         print(f"[{run_id}] GA: Running baseline simulation...")
-        initial_sim = Simulation(deepcopy(initial_sim_config_regions), f"baseline_{run_id}")
+        initial_sim = Simulation(deepcopy(initial_sim_config_regions), f"baseline_{run_id}",
+                                 **simulation_kwargs(
+                                     output_profile='compact',
+                                     progress_callback=progress_publisher(progress_db, run_id, phase='ga_baseline'),
+                                     **mesh_kwargs(config)
+                                 ))
         initial_sim.write_all()
         initial_sim.run_all()
         initial_max_temp_K = initial_sim.get_results().max_temp()
@@ -169,9 +220,13 @@ def run_ga_optimization(config, run_id, simulations_db):
         ga = GAOptimizer(
             base=initial_sim_config_regions,
             optim_dict=optim_dict,
-            mutation_scale=10,
-            generations=5,
-            num_per_gen=4 # Increased for better search
+            sim_kwargs=simulation_kwargs(
+                output_profile='compact',
+                progress_callback=progress_publisher(progress_db, run_id, phase='ga'),
+                **mesh_kwargs(config)
+            ),
+            screening_kwargs=ga_screening_kwargs(progress_publisher(progress_db, run_id, phase='ga_screening')),
+            **GA_SETTINGS
         )
         ga.start()
         print(f"[{run_id}] GA: Optimization finished.")
@@ -181,9 +236,9 @@ def run_ga_optimization(config, run_id, simulations_db):
             raise RuntimeError("GA finished with no valid results.")
 
         # Step 6: Process results and create the final configuration.
-        ga.results.sort(key=lambda x: x[1])
-        best_result = ga.results[0]
-        best_position_indices, minimized_max_temp = best_result
+        full_results = sorted((r for r in ga.results if r[2] == 'full'), key=lambda x: x[1])
+        best_result = full_results[0]
+        best_position_indices, minimized_max_temp, _ = best_result
 
         result_data = {
             'type': 'GA',
@@ -209,7 +264,8 @@ def run_ga_optimization(config, run_id, simulations_db):
                 rack['dims'][1] = (new_pos['y_max'] - new_pos['y_min']) * px_to_meters
         
         # Step 7: Run the final, optimized simulation.
-        run_openfoam_simulation(final_standard_config, run_id, simulations_db, is_optimization_run=True)
+        run_openfoam_simulation(final_standard_config, run_id, simulations_db, is_optimization_run=True,
+                                progress_db=progress_db)
 
         with open(run_path / 'optimization_result.json', 'w') as f:
             json.dump(result_data, f, indent=4)
@@ -0,0 +1,243 @@
+import os
+import shutil
+import tarfile
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from job_registry import ACTIVE_STATUSES
+from simulation.cache import MESH_CACHE_DIR, MeshCache
+from simulation.foam_files import time_directories
+
+# Files of a finished run that are kept by compaction, besides its final time step: what get_result_file serves,
+# the manifest and the runner log.
+KEEP_PATTERNS = ('*.gltf', 'manifest.json', 'optimization_result.json', 'simulation_runner.log')
+# Marks a compacted run; its mtime is bumped whenever a result is served, see touch().
+ACCESSED_FILE = '.accessed'
+COMPACTED_FILE = '.compacted'
+ARCHIVE_DIR = '.archive'
+
+
+def env_seconds(name: str, default_hours: float | None) -> float | None:
+    value = os.environ.get(name)
+    if value is None:
+        return default_hours * 3600 if default_hours is not None else None
+    return float(value) * 3600 if value else None
+
+
+def inodes(path: str | Path) -> dict[tuple[int, int], os.stat_result]:
+    """The files at or below path by (device, inode), so hard-linked files (shared with the mesh cache) appear once."""
+    path = Path(path)
+    paths = [path] if path.is_file() else (Path(root) / name for root, _, files in os.walk(path) for name in files)
+    res = {}
+    for file in paths:
+        try:
+            st = os.lstat(file)
+        except OSError:
+            continue
+        res[st.st_dev, st.st_ino] = st
+    return res
+
+
+def disk_usage(path: str | Path, exclusive: bool = False) -> int:
+    """
+    Bytes used below path, counting hard-linked files once. With exclusive, only the files that have no other link,
+    i.e. what deleting path frees.
+    """
+    return sum(st.st_size for st in inodes(path).values() if not (exclusive and st.st_nlink > 1))
+
+
+def touch(run_dir: str | Path):
+    """Records that a run's results were used, which restarts its retention clock."""
+    (Path(run_dir) / ACCESSED_FILE).touch()
+
+
+def compact_run(run_dir: str | Path) -> int:
+    """
+    Reduces a finished run to its final time step, the glTF files, the manifest and the runner log. The mesh, the
+    initial fields, earlier time steps, the case dictionaries and the OpenFOAM logs are removed. Returns the bytes
+    freed.
+    """
+    run_dir = Path(run_dir)
+    before = disk_usage(run_dir)
+    times = time_directories(run_dir)
+    final_time = times[-1][1] if times and times[-1][0] > 0 else None
+    keep = {path for pattern in KEEP_PATTERNS for path in run_dir.glob(pattern)}
+    keep |= {run_dir / ACCESSED_FILE, final_time}
+
+    for path in run_dir.iterdir():
+        if path in keep:
+            continue
+        if path.is_dir() and not path.is_symlink():
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            path.unlink(missing_ok=True)
+    (run_dir / COMPACTED_FILE).touch()
+    return before - disk_usage(run_dir)
+
+
+def archive_path(root: str | Path, run_id: str) -> Path:
+    return Path(root) / ARCHIVE_DIR / f'{run_id}.tar.gz'
+
+
+def archive_run(root: str | Path, run_id: str) -> Path:
+    """Moves simulations/<run_id> into a compressed tarball under simulations/.archive."""
+    run_dir = Path(root) / run_id
+    target = archive_path(root, run_id)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(f'.{target.name}.tmp')
+    with tarfile.open(tmp, 'w:gz') as tar:
+        tar.add(run_dir, arcname=run_id)
+    os.replace(tmp, target)
+    shutil.rmtree(run_dir, ignore_errors=True)
+    return target
+
+
+def restore_run(root: str | Path, run_id: str) -> bool:
+    """Unpacks an archived run back into simulations/<run_id>. Returns False when there is no archive."""
+    source = archive_path(root, run_id)
+    run_dir = Path(root) / run_id
+    if run_dir.is_dir():
+        return True
+    if not source.exists():
+        return False
+
+    # unpacked next to the target and renamed, so a concurrent request never sees a half-restored run
+    tmp = Path(root) / f'.restore-{run_id}-{os.getpid()}-{threading.get_ident()}'
+    with tarfile.open(source, 'r:gz') as tar:
+        tar.extractall(tmp, filter='data')
+    try:
+        os.rename(tmp / run_id, run_dir)
+    except OSError:
+        # restored by someone else in the meantime
+        if not run_dir.is_dir():
+            raise
+    shutil.rmtree(tmp, ignore_errors=True)
+    source.unlink(missing_ok=True)
+    touch(run_dir)
+    return True
+
+
+class RetentionPolicy:
+    """
+    Ages finished runs through compaction, archiving and eviction, and evicts the least recently used runs and
+    cached meshes while the finished runs, live or archived, and the mesh cache take more than the quota. Ages count
+    from the end of the run or, if later, the last time a result was served; a cached mesh was last used when it was
+    stored or restored. None disables a step. Runs of active jobs are never touched, nor counted towards the quota.
+    """
+
+    def __init__(
+            self,
+            compact_after: float | None = env_seconds('SIMULATION_COMPACT_AFTER_HOURS', 1),
+            archive_after: float | None = env_seconds('SIMULATION_ARCHIVE_AFTER_HOURS', 7 * 24),
+            evict_after: float | None = env_seconds('SIMULATION_EVICT_AFTER_HOURS', 90 * 24),
+            quota_bytes: float | None = (
+                float(os.environ['SIMULATION_QUOTA_GB']) * 1e9 if os.environ.get('SIMULATION_QUOTA_GB') else None
+            )
+    ):
+        self.compact_after = compact_after
+        self.archive_after = archive_after
+        self.evict_after = evict_after
+        self.quota_bytes = quota_bytes
+
+    @staticmethod
+    def last_used(path: Path, record: dict | None) -> float:
+        times = [path.stat().st_mtime if record is None or record.get('finished') is None else record['finished']]
+        accessed = path / ACCESSED_FILE
+        if path.is_dir() and accessed.exists():
+            times.append(accessed.stat().st_mtime)
+        return max(times)
+
+    def runs(self, root: Path, registry) -> list[tuple[float, str, Path]]:
+        """(last used, run_id, path) of every finished run, live or archived, least recently used first."""
+        res = []
+        for path in root.iterdir():
+            if path.name.startswith('.') or not path.is_dir():
+                continue
+            record = registry.record(path.name)
+            if record is not None and record['status'] in (*ACTIVE_STATUSES, 'resuming'):
+                continue
+            res.append((self.last_used(path, record), path.name, path))
+        archive_dir = root / ARCHIVE_DIR
+        if archive_dir.is_dir():
+            for path in archive_dir.glob('*.tar.gz'):
+                res.append((path.stat().st_mtime, path.name.removesuffix('.tar.gz'), path))
+        return sorted(res)
+
+    def evict(self, registry, run_id: str, path: Path):
+        if path.is_dir():
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            path.unlink(missing_ok=True)
+        # evicted results must no longer be handed out for identical requests (see JobRegistry.claim)
+        if run_id in registry:
+            registry[run_id] = 'evicted'
+
+    def enforce(self, root: str | Path, registry, now: float | None = None) -> dict:
+        """One retention pass over root. Returns how many runs each step touched."""
+        root = Path(root)
+        now = time.time() if now is None else now
+        counts = {'compacted': 0, 'archived': 0, 'evicted': 0, 'evicted_meshes': 0}
+
+        for last_used, run_id, path in self.runs(root, registry):
+            age = now - last_used
+            if self.evict_after is not None and age > self.evict_after:
+                self.evict(registry, run_id, path)
+                counts['evicted'] += 1
+                continue
+            if not path.is_dir():
+                continue
+            if self.archive_after is not None and age > self.archive_after:
+                archive = archive_run(root, run_id)
+                # the archive keeps aging from the run's last use
+                os.utime(archive, (last_used, last_used))
+                counts['archived'] += 1
+            elif self.compact_after is not None and age > self.compact_after and not (path / COMPACTED_FILE).exists():
+                compact_run(path)
+                counts['compacted'] += 1
+
+        if self.quota_bytes is not None:
+            mesh_cache = MeshCache(root / MESH_CACHE_DIR)
+            entries = sorted(
+                self.runs(root, registry) + [(path.stat().st_mtime, None, path) for path in mesh_cache.entries()],
+                key=lambda entry: entry[0]
+            )
+            files = [inodes(path) for _, _, path in entries]
+            # a file linked by a run and a cached mesh is counted once, and only freed once both are gone
+            links = Counter(key for entry_files in files for key in entry_files)
+            sizes = {key: st.st_size for entry_files in files for key, st in entry_files.items()}
+            usage = sum(sizes.values())
+            for (_, run_id, path), entry_files in zip(entries, files):
+                if usage <= self.quota_bytes:
+                    break
+                if run_id is None:
+                    mesh_cache.evict(path)
+                    counts['evicted_meshes'] += 1
+                else:
+                    self.evict(registry, run_id, path)
+                    counts['evicted'] += 1
+                for key in entry_files:
+                    links[key] -= 1
+                    if not links[key]:
+                        usage -= sizes[key]
+        return counts
+
+
+def start_retention(root: str | Path, registry, policy: RetentionPolicy | None = None, interval: float = 3600.0):
+    """Runs policy.enforce every interval seconds in a daemon thread."""
+    policy = policy or RetentionPolicy()
+
+    def loop():
+        while True:
+            try:
+                counts = policy.enforce(root, registry)
+                if any(counts.values()):
+                    print(f"Retention: {counts}")
+            except Exception as e:
+                print(f"Retention pass failed: {e}")
+            time.sleep(interval)
+
+    thread = threading.Thread(target=loop, name='retention', daemon=True)
+    thread.start()
+    return thread
@@ -1,44 +1,81 @@
+import filecmp
 import json
 import os
 import shutil
 import subprocess
 from pathlib import Path
 
-from foamlib import FoamCase, FoamFile
+from foamlib import FoamCase, FoamFieldFile, FoamFile
+import numpy as np
 import pyvista as pv
 from tqdm import tqdm
 
+from simulation.cache import CaseSkeletonStore, MeshCache, settings_hash
 from simulation.fields.buoyant_simple_foam import *
-from simulation.objects import cube
+from simulation.foam_files import time_directories, write_field_file, write_foam_dict
+from simulation.manifest import RunManifest, mesh_cell_count
+from simulation.meshing import background_mesh_dims, wall_grading
+from simulation.objects import boxes, cube
+from simulation.objects.cutouts import faces_shm_geometry_dict, faces_shm_refinement_dict
+from simulation.objects.stl import write_solids
+from simulation.progress import ProgressTracker
+from simulation.result_loader import ResultCache, ResultDataset
+from simulation.supervisor import TIME_RE, ConvergenceCriteria, SolverSupervisor
 
 
 class Results:
     def __init__(self, foam_case):
         self.foam_case: FoamFile = foam_case
+        self.cache = ResultCache(foam_case.path)
+
+    def load(self, t=-1) -> ResultDataset:
+        """
+        Mesh and fields of time step t (an index, -1 the latest), read once and shared by every method here until
+        clear() or until this object is dropped.
+        """
+        return self.cache.load(t)
+
+    def clear(self):
+        self.cache.clear()
 
     def max_temp(self, t=-1):
+        # reads T alone, the optimizers call this for every candidate
         with self.foam_case[t]['T'] as f:
-            return f.internal_field.max()
+            return float(np.max(f.internal_field))
+
+    def statistics(self, t=-1) -> dict:
+        """Volume-weighted temperature and speed statistics of the room, and the mean temperature of every patch."""
+        dataset = self.load(t)
+        mesh = dataset.internal_mesh
+        volumes = mesh.compute_cell_sizes(length=False, area=False, volume=True).cell_data['Volume']
+        temperature = mesh.cell_data['T']
+        speed = np.linalg.norm(mesh.cell_data['U'], axis=1)
+        return {
+            'time': dataset.time,
+            'cells': mesh.n_cells,
+            'T_min': float(temperature.min()),
+            'T_max': float(temperature.max()),
+            'T_mean': float(np.average(temperature, weights=volumes)),
+            'U_max': float(speed.max()),
+            'U_mean': float(np.average(speed, weights=volumes)),
+            'patch_T_mean': {
+                name: float(patch.cell_data['T'].mean())
+                for name, patch in dataset.patches.items() if 'T' in patch.cell_data and patch.n_cells
+            },
+        }
 
     def convert_results_to_gltf(self):
         """Uses PyVista Plotter to convert the final OpenFOAM timestep to glTF files."""
         try:
-            reader = pv.OpenFOAMReader(str(self.foam_case.path / f'{self.foam_case.path.name}.foam'))
-            reader.set_active_time_value(reader.time_values[-1])
-            mesh_data = reader.read()['internalMesh']
-            if mesh_data is None:
-                raise Exception("Failed to read internalMesh from OpenFOAM results.")
+            dataset = self.load()
+            mesh_data = dataset.internal_mesh
             min_temp, max_temp = mesh_data.get_data_range('T')
 
             original_slice = mesh_data.slice('z', origin=(0, 0, 2.5))
             original_slice = original_slice.compute_normals(consistent_normals=True)
             original_slice = original_slice.flip_faces()
 
-            boundary = reader.read()["boundary"]
-            surfs = []
-            for k in reader.read()["boundary"].keys():
-                if k != "defaultFaces":
-                    surfs.append(boundary[k].extract_surface().flip_faces())
+            surfs = [patch.extract_surface().flip_faces() for patch in dataset.patches.values()]
 
             plotter_temp = pv.Plotter(off_screen=True, lighting='light_kit')
             plotter_temp.add_mesh(
@@ -61,21 +98,6 @@ class Results:
                 clim=(min_temp, max_temp)
             )
 
-            mesh_data = reader.read()['internalMesh']
-            if mesh_data is None:
-                raise Exception("Failed to read internalMesh from OpenFOAM results.")
-            min_temp, max_temp = mesh_data.get_data_range('T')
-
-            original_slice = mesh_data.slice('z', origin=(0, 0, 1))
-            original_slice = original_slice.compute_normals(consistent_normals=True)
-            original_slice = original_slice.flip_faces()
-
-            boundary = reader.read()["boundary"]
-            surfs = []
-            for k in reader.read()["boundary"].keys():
-                if k != "defaultFaces":
-                    surfs.append(boundary[k].extract_surface().flip_faces())
-
             plotter_vel = pv.Plotter(off_screen=True, lighting='light_kit')
             plotter_vel.add_mesh(
                 mesh_data.outline()
@@ -129,7 +151,75 @@ class Results:
 
 
 class Simulation:
-    def __init__(self, inp: str|Path|list[dict], foam_case_dir: str|Path, overwrite=True):
+    # Dictionaries that, together with the object bounds, fully determine the mesh.
+    MESH_DICTS = ('blockMeshDict', 'snappyHexMeshDict', 'surfaceFeatureExtractDict', 'meshQualityDict')
+
+    END_TIME = 10000
+
+    # The ranks inherit the core set the job is pinned to; mpirun's own binding would place every job on the same
+    # first cores of the machine.
+    MPIRUN_OPTIONS = ('--bind-to', 'none')
+
+    # Finished stages ('case', 'mesh', 'fields', 'solve') of a run, one per line, so a resumed run can skip them.
+    STAGES_FILE = '.stages'
+
+    # snappyHexMesh maxGlobalCells when no cell budget is given.
+    MAX_GLOBAL_CELLS = 2000000
+
+    # How object surfaces are handed to snappyHexMesh: one STL per face, one multi-solid STL per object, a single
+    # multi-solid STL for the whole scene, or analytic searchablePlates with no STLs and no surfaceFeatureExtract.
+    # Patch names are the face names in every mode.
+    GEOMETRY_MODES = ('faces', 'objects', 'scene', 'searchable')
+
+    # Surface refinement levels for faces that drive the flow (rack inlets/outlets, cooler inlets, tile outlets) and
+    # for passive walls, plus an optional refinement box of near_field_depth metres in front of every active face.
+    # Regions can override the levels with 'refinement_levels' and per face with 'face_refinement_levels'.
+    REFINEMENT_POLICIES = {
+        'uniform': {'active': (2, 3), 'passive': (2, 3), 'near_field_depth': None, 'near_field_level': None},
+        'localized': {'active': (2, 3), 'passive': (1, 2), 'near_field_depth': 0.5, 'near_field_level': 2},
+        'coarse': {'active': (1, 2), 'passive': (0, 1), 'near_field_depth': None, 'near_field_level': None},
+    }
+
+    # Dimensions and uniform initial value of every field written to 0/.
+    INITIAL_FIELDS = {
+        'alphat': (FoamFile.DimensionSet(mass=1, length=-1, time=-1), 0),
+        'epsilon': (FoamFile.DimensionSet(length=2, time=-3), 0.23),
+        'k': (FoamFile.DimensionSet(length=2, time=-2), 0.08),
+        'nut': (FoamFile.DimensionSet(length=2, time=-1), 0),
+        'p': (FoamFile.DimensionSet(mass=1, length=-1, time=-2), 101325),
+        'p_rgh': (FoamFile.DimensionSet(mass=1, length=-1, time=-2), 101325),
+        'T': (FoamFile.DimensionSet(temperature=1), 295.15),
+        'U': (FoamFile.DimensionSet(length=1, time=-1), [0, 0, 0]),
+    }
+
+    # Solver output settings. When 'fields' is set, only the final time step is written and every other field
+    # is removed from it after the run, which is all Results needs.
+    OUTPUT_PROFILES = {
+        'ascii': {'format': 'ascii', 'compression': 'off', 'fields': None},
+        'binary': {'format': 'binary', 'compression': 'off', 'fields': None},
+        'compact': {'format': 'binary', 'compression': 'on', 'fields': ['T', 'U', 'p_rgh']},
+    }
+
+    def __init__(
+            self,
+            inp: str|Path|list[dict],
+            foam_case_dir: str|Path,
+            overwrite=True,
+            skeleton_store: CaseSkeletonStore | None = None,
+            mesh_cache: MeshCache | None = None,
+            output_profile: str | dict = 'ascii',
+            n_procs: int = 1,
+            parent_case: str | Path | None = None,
+            convergence: ConvergenceCriteria | None = None,
+            progress_callback=None,
+            geometry_mode: str = 'faces',
+            cell_size: float | None = None,
+            cell_budget: int | None = None,
+            wall_grading_ratio: float | None = None,
+            refinement: str = 'uniform',
+            checkpoint_interval: int | None = None,
+            resume: bool = False
+    ):
         if isinstance(inp, str) or isinstance(inp, Path):
             with open(inp, "r") as f:
                 self.regions = json.load(f)
@@ -140,7 +230,33 @@ class Simulation:
             foam_case_dir = Path(foam_case_dir)
         self.foam_case_dir = foam_case_dir
         self.foam_case = None
-        self.load_foam_case(overwrite=overwrite)
+        self.skeleton_store = skeleton_store
+        self.mesh_cache = mesh_cache
+        if isinstance(output_profile, str):
+            if output_profile not in self.OUTPUT_PROFILES:
+                raise ValueError(f"Unknown output profile {output_profile}")
+            output_profile = self.OUTPUT_PROFILES[output_profile]
+        self.output_profile = output_profile
+        self.n_procs = n_procs
+        self.parent_case = Path(parent_case) if parent_case is not None else None
+        self.convergence = convergence
+        if geometry_mode not in self.GEOMETRY_MODES:
+            raise ValueError(f"Unknown geometry mode {geometry_mode}")
+        self.geometry_mode = geometry_mode
+        self.cell_size = cell_size
+        self.cell_budget = cell_budget
+        self.wall_grading_ratio = wall_grading_ratio
+        if refinement not in self.REFINEMENT_POLICIES:
+            raise ValueError(f"Unknown refinement policy {refinement}")
+        self.refinement = self.REFINEMENT_POLICIES[refinement]
+        self.checkpoint_interval = checkpoint_interval
+        self.progress = ProgressTracker(progress_callback, self.END_TIME) if progress_callback is not None else None
+        self.resumed = False
+        self.load_foam_case(overwrite=overwrite, resume=resume)
+        self.manifest = RunManifest(self.foam_case_dir / 'manifest.json', resume=self.resumed)
+        self.manifest.record(geometry_mode=geometry_mode, refinement=refinement, n_procs=n_procs)
+        if self.resumed:
+            self.manifest.record(resumed_stages=sorted(self.completed_stages()), resumed_from=self.latest_time())
 
         self.load_objects()
 
@@ -152,44 +268,289 @@ class Simulation:
         if self.room_dict is None:
             raise ValueError("No room definition found in input.")
 
-    def _run_cmd(self, cmd, log_file=None):
-        with open(log_file, "w") as f:
-            try:
-                subprocess.run(cmd, stdout=f, stderr=subprocess.STDOUT, cwd=self.foam_case_dir, check=True)
-                print(f'{cmd[0]} completed successfully.')
-            except subprocess.CalledProcessError as e:
-                error_msg = f'Running {cmd[0]} failed with return code {e.returncode}. '
-                if log_file is not None:
-                    error_msg += f'Logs written to {log_file}'
-                raise RuntimeError(error_msg)
+    def _run_cmd(self, cmd, log_file=None, supervisor: SolverSupervisor | None = None):
+        """
+        Runs an OpenFOAM utility, streaming its output into log_file. The stream also feeds the progress tracker and,
+        for the solver, the convergence supervisor, whose stop and kill decisions are acted on here.
+        """
+        app = cmd[3 + len(self.MPIRUN_OPTIONS)] if cmd[0] == 'mpirun' else cmd[0]
+        if self.progress is not None:
+            self.progress.start_stage(app)
+
+        with self.manifest.stage(app, 'command', log=Path(log_file).name) as stage:
+            iterations = 0
+            with open(log_file, "w") as f:
+                process = subprocess.Popen(
+                    cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, cwd=self.foam_case_dir, text=True
+                )
+                for line in process.stdout:
+                    f.write(line)
+                    if TIME_RE.match(line):
+                        iterations += 1
+                    if self.progress is not None:
+                        self.progress.feed(line)
+                    if supervisor is None:
+                        continue
+
+                    action = supervisor.feed(line)
+                    if action == 'stop':
+                        print(f'{app} converged ({supervisor.reason}), stopping.')
+                        self.request_stop()
+                    elif action == 'kill':
+                        process.terminate()
+                    elif action == 'terminate':
+                        # The stop request was not picked up, e.g. because the controlDict is not re-read.
+                        print(f'{app} ignored the stop request, terminating.')
+                        process.terminate()
+                returncode = process.wait()
+
+            stage['returncode'] = returncode
+            if iterations:
+                stage['iterations'] = iterations
+                if app == 'buoyantSimpleFoam':
+                    # a resumed solver adds to the iterations of the interrupted one
+                    self.manifest.record(iterations=(self.manifest.data['iterations'] or 0) + iterations)
+
+        if supervisor is not None and supervisor.diverged:
+            raise RuntimeError(f'{app} diverged: {supervisor.reason}. Logs written to {log_file}')
+        if returncode != 0:
+            raise RuntimeError(f'Running {app} failed with return code {returncode}. Logs written to {log_file}')
+        print(f'{app} completed successfully.')
+
+    def request_stop(self):
+        """Asks a running solver to write the current solution and exit, the same way foamEndJob does."""
+        with self.foam_case.control_dict as f:
+            f['stopAt'] = 'writeNow'
+
+    def completed_stages(self) -> set[str]:
+        path = self.foam_case_dir / self.STAGES_FILE
+        return set(path.read_text().split()) if path.exists() else set()
+
+    def mark_stage(self, stage: str):
+        with open(self.foam_case_dir / self.STAGES_FILE, 'a') as f:
+            f.write(f'{stage}\n')
+
+    def latest_time(self) -> float:
+        """Latest written solver time, in the case or, for an interrupted parallel run, in its processor directories."""
+        case_dirs = [self.foam_case_dir, self.foam_case_dir / 'processor0']
+        return max((t for path in case_dirs if path.is_dir() for t, _ in time_directories(path)), default=0)
 
     def run_all(self):
+        stages = self.completed_stages()
+        if 'mesh' in stages:
+            print(f'Resuming with the existing mesh in {self.foam_case_dir}.')
+        else:
+            mesh_key = self.get_mesh_key() if self.mesh_cache is not None else None
+            if mesh_key is not None and self.mesh_cache.restore(mesh_key, self.foam_case_dir):
+                print(f'Reusing cached mesh {mesh_key}.')
+                self.manifest.record(mesh_cached=True)
+            else:
+                self.run_meshing()
+                if mesh_key is not None:
+                    self.mesh_cache.store(mesh_key, self.foam_case_dir)
+            self.mark_stage('mesh')
+        self.manifest.record(cells=mesh_cell_count(self.foam_case_dir))
+        # kept for a resumed run should the solver be interrupted
+        self.manifest.write()
+        if self.parent_case is not None and 'fields' not in stages:
+            self.map_parent_fields()
+            self.mark_stage('fields')
+        if 'solve' in stages:
+            self.manifest.write()
+            return
+        try:
+            self.run_solver()
+            self.mark_stage('solve')
+        finally:
+            self.manifest.write()
+
+    def _parallel(self, cmd):
+        if self.n_procs > 1:
+            return ['mpirun', '-np', str(self.n_procs), *self.MPIRUN_OPTIONS, *cmd, '-parallel']
+        return cmd
+
+    def _clear_processor_dirs(self):
+        for path in self.foam_case_dir.glob('processor*'):
+            shutil.rmtree(path, ignore_errors=True)
+
+    def run_meshing(self):
         self._run_cmd(['blockMesh'], self.foam_case_dir / 'log.blockMesh')
-        self._run_cmd(['surfaceFeatureExtract'], self.foam_case_dir / 'log.surfaceFeatureExtract')
-        self._run_cmd(['snappyHexMesh', '-overwrite'], self.foam_case_dir / 'log.snappyHexMesh')
-        self._run_cmd(['buoyantSimpleFoam'], self.foam_case_dir / 'log.buoyantBoussinesqSimpleFoam')
+        if self.geometry_mode != 'searchable':
+            self._run_cmd(['surfaceFeatureExtract'], self.foam_case_dir / 'log.surfaceFeatureExtract')
+        if self.n_procs > 1:
+            self._run_cmd(['decomposePar', '-force'], self.foam_case_dir / 'log.decomposeParMesh')
+        self._run_cmd(self._parallel(['snappyHexMesh', '-overwrite']), self.foam_case_dir / 'log.snappyHexMesh')
+        if self.n_procs > 1:
+            # The mesh is reconstructed so it can be cached and decomposed again together with the fields.
+            self._run_cmd(['reconstructParMesh', '-constant'], self.foam_case_dir / 'log.reconstructParMesh')
+            self._clear_processor_dirs()
+
+    def run_solver(self):
+        # an interrupted parallel run continues from the time steps in its processor directories
+        processor0 = self.foam_case_dir / 'processor0'
+        restart_decomposed = self.resumed and processor0.is_dir() and any(
+            t > 0 for t, _ in time_directories(processor0)
+        )
+        if self.n_procs > 1 and not restart_decomposed:
+            self._run_cmd(['decomposePar', '-force'], self.foam_case_dir / 'log.decomposePar')
+        solver_cmd = self._parallel(['buoyantSimpleFoam'])
+        solver_log = self.foam_case_dir / 'log.buoyantBoussinesqSimpleFoam'
+        supervisor = SolverSupervisor(self.convergence) if self.convergence is not None else None
+        self._run_cmd(solver_cmd, solver_log, supervisor=supervisor)
+        if self.n_procs > 1:
+            # Results reads the reconstructed case.
+            self._run_cmd(['reconstructPar', '-latestTime'], self.foam_case_dir / 'log.reconstructPar')
+            self._clear_processor_dirs()
+        self.prune_fields()
+
+    def prune_fields(self):
+        """Removes the fields the output profile does not keep from the written time directories."""
+        keep = self.output_profile.get('fields')
+        if keep is None:
+            return
+
+        for time, path in time_directories(self.foam_case_dir):
+            if time == 0:
+                continue
+            for field_file in path.iterdir():
+                if field_file.is_file() and field_file.name.removesuffix('.gz') not in keep:
+                    field_file.unlink()
+
+    def map_parent_fields(self):
+        """
+        Uses the latest solution of parent_case as the initial condition. The fields are copied directly when both
+        cases share the same mesh and mapped with mapFields otherwise. Boundary conditions always come from this case.
+        """
+        times = time_directories(self.parent_case)
+        if not times or times[-1][0] == 0:
+            print(f'No solution found in {self.parent_case}, starting from the initial fields.')
+            return
+
+        if self._same_mesh_as(self.parent_case) and self._copy_fields_from(times[-1][1]):
+            print(f'Copied initial fields from {times[-1][1]}.')
+            return
+
+        self._run_cmd(
+            ['mapFields', self.parent_case.absolute().as_posix(), '-consistent', '-sourceTime', 'latestTime'],
+            self.foam_case_dir / 'log.mapFields'
+        )
+
+    def _same_mesh_as(self, other_case: Path):
+        mesh_dir = self.foam_case_dir / 'constant' / 'polyMesh'
+        other_mesh_dir = other_case / 'constant' / 'polyMesh'
+        if not mesh_dir.is_dir() or not other_mesh_dir.is_dir():
+            return False
+
+        names = sorted(p.name for p in mesh_dir.iterdir() if p.is_file())
+        if names != sorted(p.name for p in other_mesh_dir.iterdir() if p.is_file()):
+            return False
+        for name in names:
+            a, b = mesh_dir / name, other_mesh_dir / name
+            if not (os.path.samefile(a, b) or filecmp.cmp(a, b, shallow=False)):
+                return False
+        return True
+
+    def _copy_fields_from(self, time_dir: Path):
+        # With a nonuniform internal field, '$internalField' in a boundary condition no longer has the patch size, so
+        # every such reference is replaced by the parent's value for the same patch and key. Gives up (without having
+        # written anything) when one cannot be resolved, e.g. because a patch changed its boundary condition type.
+        updates = {}
+        for field_file in (self.foam_case_dir / '0').iterdir():
+            source = time_dir / field_file.name
+            if not source.is_file():
+                source = time_dir / f'{field_file.name}.gz'
+            if not source.is_file():
+                continue
+
+            parent = FoamFieldFile(source).as_dict()
+            boundary_field = FoamFieldFile(field_file).as_dict()['boundaryField']
+            for patch, entries in boundary_field.items():
+                for key, value in entries.items():
+                    if isinstance(value, str) and value == '$internalField':
+                        parent_value = parent['boundaryField'].get(patch, {}).get(key)
+                        if parent_value is None:
+                            return False
+                        entries[key] = parent_value
+            updates[field_file] = (parent['internalField'], boundary_field)
+
+        for field_file, (internal_field, boundary_field) in updates.items():
+            # The nonuniform internal field is assigned last: foamlib can mangle it when further entries of the same
+            # file are assigned after it within one block.
+            with FoamFieldFile(field_file) as f:
+                f.boundary_field = boundary_field
+                f.internal_field = internal_field
+        return True
+
+    def get_mesh_key(self):
+        """Hash of everything the mesh depends on. Call after the case files have been written."""
+        bounds = [
+            (region['name'], [region[k] for k in ('x_min', 'x_max', 'y_min', 'y_max', 'z_min', 'z_max')])
+            for region in self.regions
+        ]
+        dicts = [
+            (self.foam_case_dir / 'system' / name).read_bytes()
+            for name in self.MESH_DICTS
+            if (self.foam_case_dir / 'system' / name).exists()
+        ]
+        return settings_hash(bounds, *dicts)
 
     def get_results(self):
         (self.foam_case_dir / f'{self.foam_case_dir.name}.foam').touch()
         return Results(self.foam_case)
 
+    def _timed(self, write_step, *args):
+        with self.manifest.stage(write_step.__name__):
+            write_step(*args)
+
     def write_all(self):
-        self.write_all_objects((self.foam_case_dir / 'constant' / 'triSurface').absolute().as_posix())
-        self.write_control_dict()
-        self.write_fv_schemes()
-        self.write_fv_solution()
-        self.write_block_mesh_dict()
-        self.write_snappy_hex_mesh_dict()
-        self.write_mesh_quality_dict()
-        self.write_field_files()
-        self.write_g_dict()
-        self.write_turbulence_properties()
-        self.write_thermophyiscal_properties()
-        self.write_surface_feature_extract_dict()
-
-
-    def load_foam_case(self, overwrite=True):
+        if self.resumed:
+            # the case files are complete, only the solver has to pick up where it stopped
+            self._timed(self.write_restart_control_dict)
+            return
+
+        self._timed(self.write_all_objects, (self.foam_case_dir / 'constant' / 'triSurface').absolute().as_posix())
+        self._timed(self.write_control_dict)
+        self._timed(self.write_static_files)
+        self._timed(self.write_block_mesh_dict)
+        self._timed(self.write_snappy_hex_mesh_dict)
+        self._timed(self.write_field_files)
+        if self.geometry_mode != 'searchable':
+            self._timed(self.write_surface_feature_extract_dict)
+        if self.n_procs > 1:
+            self._timed(self.write_decompose_par_dict)
+        self.mark_stage('case')
+        self.manifest.write()
+
+    def get_static_dicts(self) -> dict[str, dict]:
+        """Case files that depend neither on the geometry nor on the boundary conditions."""
+        return {
+            'system/fvSchemes': self.get_fv_schemes_dict(),
+            'system/fvSolution': self.get_fv_solution_dict(),
+            'system/meshQualityDict': self.get_mesh_quality_dict(),
+            'constant/g': self.get_g_dict(),
+            'constant/turbulenceProperties': self.get_turbulence_properties_dict(),
+            'constant/thermophysicalProperties': self.get_thermophysical_properties_dict(),
+        }
+
+    def write_static_files(self):
+        static_dicts = self.get_static_dicts()
+        if self.skeleton_store is not None:
+            self.skeleton_store.clone(static_dicts, self.foam_case_dir)
+        else:
+            for rel_path, entries in static_dicts.items():
+                write_foam_dict(self.foam_case_dir / rel_path, entries)
+
+    def load_foam_case(self, overwrite=True, resume=False):
+        """
+        Creates an empty case directory. With resume, a case whose files were completely written by an earlier,
+        interrupted run is kept as it is instead.
+        """
         path = Path(self.foam_case_dir)
+        if resume and 'case' in self.completed_stages():
+            self.foam_case = FoamCase(path)
+            self.resumed = True
+            return
+
         if path.exists():
             if overwrite:
                 shutil.rmtree(path, ignore_errors=True)
@@ -218,48 +579,128 @@ class Simulation:
                 total_tile_area += (region['x_max'] - region['x_min']) * (region['y_max'] - region['y_min'])
         tile_flow_rate = total_tile_area / total_ac_flow_rate
 
+        object_regions = [region for region in self.regions if region['type'] != 'room']
+        bounds = [
+            [
+                region['x_min'], region['x_max'],
+                region['y_min'], region['y_max'],
+                region['z_min'], region['z_max']
+            ]
+            for region in object_regions
+        ]
+        bc_mappings = []
+        for region in object_regions:
+            region_bc_mappings = {
+                "z_min": wall(),
+                "z_max": wall(),
+                "y_min": wall(),
+                "x_max": wall(),
+                "y_max": wall(),
+                "x_min": wall(),
+            }
+            if region['type'] == 'rack':
+                region_bc_mappings.update({
+                    region['inlet']: fixed_velocity_outlet([0, region['flow_rate'], 0]),
+                    region['outlet']: fixed_heat_flux_fixed_velocity_inlet(
+                        [0, region['flow_rate'], 0],
+                        region['heat_load'],
+                    ),
+                })
+            elif region['type'] == 'cooler':
+                region_bc_mappings.update({
+                    region['inlet']: open_outlet(),
+                })
+            elif region['type'] == 'tile':
+                region_bc_mappings.update({
+                    'z_max': fixed_temperature_fixed_velocity_inlet(
+                        [0, 0, tile_flow_rate],
+                        ac_set_temp,
+                    )
+                })
+            bc_mappings.append(region_bc_mappings)
+
+        objects = boxes(bounds, bc_mappings, [region['name'] for region in object_regions], check_name=False)
+        for region, region_bc_mappings, o in zip(object_regions, bc_mappings, objects):
+            for face_name, face in zip(region_bc_mappings.keys(), o.faces):
+                face.refinement_levels = self.get_face_refinement_levels(region, face_name, self.refinement)
+            region['object'] = o
+
+    @classmethod
+    def get_face_refinement_levels(cls, region, face_name: str, policy: dict) -> list[int]:
+        """Surface refinement levels of one face under a refinement policy and the region's overrides."""
+        default_levels = policy['active' if face_name in cls.get_active_faces(region) else 'passive']
+        face_levels = region.get('face_refinement_levels', {})
+        return list(face_levels.get(face_name, region.get('refinement_levels', default_levels)))
+
+    @staticmethod
+    def get_active_faces(region) -> list[str]:
+        """Faces of a region that blow or draw air, where the temperature field is decided."""
+        if region['type'] == 'rack':
+            return [region['inlet'], region['outlet']]
+        elif region['type'] == 'cooler':
+            return [region['inlet']]
+        elif region['type'] == 'tile':
+            return ['z_max']
+        return []
+
+    def get_shm_refinement_regions(self):
+        """
+        snappyHexMesh geometry and refinementRegions for boxes reaching near_field_depth into the room from every
+        active face.
+        """
+        depth = self.refinement['near_field_depth']
+        geometry = {}
+        refinement_regions = {}
+        if depth is None:
+            return geometry, refinement_regions
+
         for region in self.regions:
-            if region['type'] == 'room':
-                continue
-            else:
-                bounds = [
-                    region['x_min'], region['x_max'],
-                    region['y_min'], region['y_max'],
-                    region['z_min'], region['z_max']
-                ]
-                bc_mappings = {
-                    "z_min": wall(),
-                    "z_max": wall(),
-                    "y_min": wall(),
-                    "x_max": wall(),
-                    "y_max": wall(),
-                    "x_min": wall(),
-                }
-                if region['type'] == 'rack':
-                    bc_mappings.update({
-                        region['inlet']: fixed_velocity_outlet([0, region['flow_rate'], 0]),
-                        region['outlet']: fixed_heat_flux_fixed_velocity_inlet(
-                            [0, region['flow_rate'], 0],
-                            region['heat_load'],
-                        ),
-                    })
-                elif region['type'] == 'cooler':
-                    bc_mappings.update({
-                        region['inlet']: open_outlet(),
-                    })
-                elif region['type'] == 'tile':
-                    bc_mappings.update({
-                        'z_max': fixed_temperature_fixed_velocity_inlet(
-                            [0, 0, tile_flow_rate],
-                            ac_set_temp,
-                        )
-                    })
-                region['object'] = cube(bounds, bc_mappings, name=region['name'], check_name=False)
+            for face_name in self.get_active_faces(region):
+                axis = 'xyz'.index(face_name[0])
+                box_min = [region['x_min'], region['y_min'], region['z_min']]
+                box_max = [region['x_max'], region['y_max'], region['z_max']]
+                if face_name.endswith('_min'):
+                    box_max[axis] = box_min[axis]
+                    box_min[axis] -= depth
+                else:
+                    box_min[axis] = box_max[axis]
+                    box_max[axis] += depth
+
+                name = f"{region['name']}_{face_name}_near"
+                geometry[name] = {'type': 'searchableBox', 'min': box_min, 'max': box_max}
+                refinement_regions[name] = {'mode': 'inside', 'levels': [[1e15, self.refinement['near_field_level']]]}
+        return geometry, refinement_regions
+
+    def get_objects(self):
+        return [region['object'] for region in self.regions if region.get('object')]
 
     def write_all_objects(self, directory: str):
+        if self.geometry_mode == 'searchable':
+            return
+        if self.geometry_mode == 'scene':
+            faces = [face for o in self.get_objects() for face in o.faces]
+            write_solids(Path(directory) / 'scene.stl', [(face.name, face.triangles()) for face in faces])
+            return
+
         for region in tqdm(self.regions, desc="Writing object STLs"):
             if region.get('object'):
-                region['object'].write_stls(directory)
+                region['object'].write_stls(directory, combined=self.geometry_mode == 'objects')
+
+    def get_shm_surfaces(self):
+        """snappyHexMesh geometry and refinementSurfaces entries of all objects for the current geometry mode."""
+        if self.geometry_mode == 'scene':
+            faces = [face for o in self.get_objects() for face in o.faces]
+            return faces_shm_geometry_dict('scene', faces), faces_shm_refinement_dict('scene', faces)
+
+        geometry = {}
+        refinement_surfaces = {}
+        for o in self.get_objects():
+            if self.geometry_mode == 'searchable':
+                geometry.update(o.get_shm_searchable_geometry_dict())
+            else:
+                geometry.update(o.get_shm_geometry_dict(combined=self.geometry_mode == 'objects'))
+            refinement_surfaces.update(o.get_shm_refinement_dict(combined=self.geometry_mode == 'objects'))
+        return geometry, refinement_surfaces
 
     def write_block_mesh_dict(self):
         with self.foam_case.block_mesh_dict as f:
@@ -275,17 +716,21 @@ class Simulation:
                 [self.room_dict['x_min'], self.room_dict['y_max'], self.room_dict['z_max']],
             ]
 
-            x_blocks = int(
-                (self.room_dict['x_max'] - self.room_dict['x_min']) //
-                (self.room_dict['z_max'] - self.room_dict['z_min'])
-            )
-            y_blocks = int(
-                (self.room_dict['y_max'] - self.room_dict['y_min']) //
-                (self.room_dict['z_max'] - self.room_dict['z_min'])
+            nx, ny, nz = background_mesh_dims(
+                [
+                    self.room_dict['x_min'], self.room_dict['x_max'],
+                    self.room_dict['y_min'], self.room_dict['y_max'],
+                    self.room_dict['z_min'], self.room_dict['z_max']
+                ],
+                cell_size=self.cell_size,
+                cell_budget=self.cell_budget
             )
+            if self.wall_grading_ratio is not None:
+                # one cell per graded half at least
+                nz = max(nz, 2)
 
             f['blocks'] = [
-                'hex', [0, 1, 2, 3, 4, 5, 6, 7], [x_blocks * 2, y_blocks * 2, 2], 'simpleGrading', [1, 1, 1]
+                'hex', [0, 1, 2, 3, 4, 5, 6, 7], [nx, ny, nz], 'simpleGrading', wall_grading(self.wall_grading_ratio)
             ]
 
             f['edges'] = []
@@ -307,17 +752,41 @@ class Simulation:
             f['startFrom'] = 'startTime'
             f['startTime'] = 0
             f['stopAt'] = 'endTime'
-            f['endTime'] = 10000
+            f['endTime'] = self.END_TIME
             f['deltaT'] = 1
             f['writeControl'] = 'timeStep'
-            f['writeInterval'] = 5000
-            f['purgeWrite'] = 0
-            f['writeFormat'] = 'ascii'
+            if self.checkpoint_interval is not None:
+                # a resumed run restarts from the latest checkpoint, older ones are not needed
+                f['writeInterval'] = self.checkpoint_interval
+                f['purgeWrite'] = 1
+            else:
+                f['writeInterval'] = 5000 if self.output_profile.get('fields') is None else self.END_TIME
+                f['purgeWrite'] = 0
+            f['writeFormat'] = self.output_profile['format']
             f['writePrecision'] = 6
-            f['writeCompression'] = 'off'
+            f['writeCompression'] = self.output_profile['compression']
             f['timeFormat'] = 'general'
             f['timePrecision'] = 6
-            f['runTimeModifiable'] = 'false'
+            # The convergence supervisor stops the solver by editing stopAt, which needs the dictionary to be re-read.
+            f['runTimeModifiable'] = 'true' if self.convergence is not None else 'false'
+
+            if self.convergence is not None:
+                f['functions'] = {
+                    'monitor': {
+                        'type': 'fieldMinMax',
+                        'libs': ['"libfieldFunctionObjects.so"'],
+                        'fields': [self.convergence.monitor_field],
+                        'log': 'true',
+                        'writeControl': 'timeStep',
+                        'writeInterval': 1,
+                    }
+                }
+
+    def write_restart_control_dict(self):
+        """Restarts the solver from the latest written time step, undoing a stop request of the interrupted run."""
+        with self.foam_case.control_dict as f:
+            f['startFrom'] = 'latestTime'
+            f['stopAt'] = 'endTime'
 
     def write_snappy_hex_mesh_dict(self):
         with FoamFile(self.foam_case.path / 'system' / 'snappyHexMeshDict') as f:
@@ -325,30 +794,24 @@ class Simulation:
             f['snap'] = 'true'
             f['addLayers'] = 'false'
 
-            geometry = {}
-            for region in self.regions:
-                if region.get('object'):
-                    geometry.update(region['object'].get_shm_geometry_dict())
-            f['geometry'] = geometry
-
-            refinement_surfaces = {}
-            for region in self.regions:
-                if region.get('object'):
-                    refinement_surfaces.update(region['object'].get_shm_refinement_dict())
+            geometry, refinement_surfaces = self.get_shm_surfaces()
+            region_geometry, refinement_regions = self.get_shm_refinement_regions()
+            f['geometry'] = {**geometry, **region_geometry}
             f['refinement_surfaces'] = refinement_surfaces
 
             f['castellatedMeshControls'] = {
                 'maxLocalCells': 100000,
-                'maxGlobalCells': 2000000,
+                'maxGlobalCells': self.cell_budget if self.cell_budget is not None else self.MAX_GLOBAL_CELLS,
                 'minRefinementCells': 100,
                 'nCellsBetweenLevels': 1,
-                'features': [{
+                # searchable surfaces have no eMesh, their edges are picked up by implicitFeatureSnap
+                'features': [] if self.geometry_mode == 'searchable' else [{
                     'file': 'allFeatures.eMesh',
                     'level': 2
                 }],
                 'refinementSurfaces': refinement_surfaces,
                 'resolveFeatureAngle': 30,
-                'refinementRegions': {},
+                'refinementRegions': refinement_regions,
                 'locationInMesh': [22.5, 2.0, 3.0],
                 'allowFreeStandingZoneFaces': 'true',
             }
@@ -374,17 +837,17 @@ class Simulation:
 
             f['mergeTolerance'] = 1e-6
 
-    def write_fv_schemes(self):
-        with self.foam_case.fv_schemes as f:
-            f['ddtSchemes'] = {
+    def get_fv_schemes_dict(self):
+        return {
+            'ddtSchemes': {
                 'default': 'steadyState',
-            }
+            },
 
-            f['gradSchemes'] = {
+            'gradSchemes': {
                 'default': 'Gauss linear'
-            }
+            },
 
-            f['divSchemes'] = {
+            'divSchemes': {
                 'default': 'Gauss linear',   # todo unscam this when foamlib gets fixed
 
                 'div(phi,U)': 'bounded Gauss upwind',
@@ -400,23 +863,27 @@ class Simulation:
 
                 'div(phi,age)': 'bounded Gauss upwind'
 
-            }
+            },
 
-            f['laplacianSchemes'] = {
+            'laplacianSchemes': {
                 'default': 'Gauss linear orthogonal',
-            }
+            },
 
-            f['interpolationSchemes'] = {
+            'interpolationSchemes': {
                 'default': 'linear'
-            }
+            },
 
-            f['snGradSchemes'] = {
+            'snGradSchemes': {
                 'default': 'orthogonal'
-            }
+            },
+        }
 
-    def write_fv_solution(self):
-        with (self.foam_case.fv_solution as f):
-            f['solvers'] = {
+    def write_fv_schemes(self):
+        write_foam_dict(self.foam_case_dir / 'system/fvSchemes', self.get_fv_schemes_dict())
+
+    def get_fv_solution_dict(self):
+        return {
+            'solvers': {
                 'p_rgh': {
                     'solver': 'GAMG',
                     'smoother': 'GaussSeidel',
@@ -453,9 +920,9 @@ class Simulation:
                     'tolerance': 1e-07,
                     'relTol': 0.001
                 }
-            }
+            },
 
-            f['SIMPLE'] = {
+            'SIMPLE': {
                 'nNonOrthogonalCorrectors': 0,
                 'momentumPredictor': 'false',
 
@@ -468,9 +935,9 @@ class Simulation:
                     'k': 1e-6,
                     'epsilon': 1e-6,
                 }
-            }
+            },
 
-            f['relaxationFactors'] = {
+            'relaxationFactors': {
                 'fields': {
                     'p_rgh': 0.7
                 },
@@ -480,7 +947,11 @@ class Simulation:
                     'k': 0.7,
                     'age': 1,
                 }
-            }
+            },
+        }
+
+    def write_fv_solution(self):
+        write_foam_dict(self.foam_case_dir / 'system/fvSolution', self.get_fv_solution_dict())
 
     def write_field_files(self):
         room_object = None
@@ -517,41 +988,8 @@ class Simulation:
                     else:
                         bc_dict[field].update(object_bc[field])
 
-        with self.foam_case[0]['alphat'] as f:
-            f.dimensions = FoamFile.DimensionSet(mass=1, length=-1, time=-1)
-            f.internal_field = 0
-
-        with self.foam_case[0]['epsilon'] as f:
-            f.dimensions = FoamFile.DimensionSet(length=2, time=-3)
-            f.internal_field = 0.23
-
-        with self.foam_case[0]['k'] as f:
-            f.dimensions = FoamFile.DimensionSet(length=2, time=-2)
-            f.internal_field = 0.08
-
-        with self.foam_case[0]['nut'] as f:
-            f.dimensions = FoamFile.DimensionSet(length=2, time=-1)
-            f.internal_field = 0
-
-        with self.foam_case[0]['p'] as f:
-            f.dimensions = FoamFile.DimensionSet(mass=1, length=-1, time=-2)
-            f.internal_field = 101325
-
-        with self.foam_case[0]['p_rgh'] as f:
-            f.dimensions = FoamFile.DimensionSet(mass=1, length=-1, time=-2)
-            f.internal_field = 101325
-
-        with self.foam_case[0]['T'] as f:
-            f.dimensions = FoamFile.DimensionSet(temperature=1)
-            f.internal_field = 295.15
-
-        with self.foam_case[0]['U'] as f:
-            f.dimensions = FoamFile.DimensionSet(length=1, time=-1)
-            f.internal_field = [0, 0, 0]
-
-        for field in bc_dict.keys():
-            with self.foam_case[0][field] as f:
-                f.boundary_field = bc_dict[field]
+        for field, (dimensions, internal_field) in self.INITIAL_FIELDS.items():
+            write_field_file(self.foam_case_dir / '0' / field, dimensions, internal_field, bc_dict.get(field, {}))
 
     def write_transport_properties(self):
         with self.foam_case.transport_properties as f:
@@ -562,14 +1000,38 @@ class Simulation:
             f['Pr'] = 0.7
             f['Prt'] = 0.85
 
-    def write_g_dict(self):
-        with self.foam_case['constant']['g'] as f:
-            f['dimensions'] = FoamFile.DimensionSet(length=1, time=-2)
-            f['value'] = [0, 0, -9.81]
+    def get_g_dict(self):
+        return {
+            'dimensions': FoamFile.DimensionSet(length=1, time=-2),
+            'value': [0, 0, -9.81],
+        }
 
-    def write_thermophyiscal_properties(self):
-        with self.foam_case['constant']['thermophysicalProperties'] as f:
-            f['thermoType'] = {
+    def write_g_dict(self):
+        write_foam_dict(self.foam_case_dir / 'constant/g', self.get_g_dict())
+
+    def get_thermophysical_properties_dict(self):
+        specie = {
+            'molWeight': 28.9
+        }
+
+        equation_of_state = {
+            'rho0': 1.18,
+            'T0': 300,
+            'beta': 3.33e-3
+        }
+
+        thermodynamics = {
+            'Cp': 1005,
+            'Hf': 0
+        }
+
+        transport = {
+            'mu': 1.8,
+            'Pr': 0.7
+        }
+
+        return {
+            'thermoType': {
                 'type': 'heRhoThermo',
                 'mixture': 'pureMixture',
                 'transport': 'const',
@@ -577,51 +1039,46 @@ class Simulation:
                 'equationOfState': 'perfectGas',
                 'specie': 'specie',
                 'energy': 'sensibleEnthalpy'
-            }
-
-            specie = {
-                'molWeight': 28.9
-            }
-
-            equation_of_state = {
-                'rho0': 1.18,
-                'T0': 300,
-                'beta': 3.33e-3
-            }
-
-            thermodynamics = {
-                'Cp': 1005,
-                'Hf': 0
-            }
-
-            transport = {
-                'mu': 1.8,
-                'Pr': 0.7
-            }
+            },
 
-            f['mixture'] = {
+            'mixture': {
                 'specie': specie,
                 'equationOfState': equation_of_state,
                 'thermodynamics': thermodynamics,
                 'transport': transport,
-            }
+            },
+        }
 
-    def write_turbulence_properties(self):
-        with self.foam_case.turbulence_properties as f:
-            f['simulationType'] = 'RAS'
-            f['RAS'] = {
+    def write_thermophyiscal_properties(self):
+        write_foam_dict(self.foam_case_dir / 'constant/thermophysicalProperties', self.get_thermophysical_properties_dict())
+
+    def get_turbulence_properties_dict(self):
+        return {
+            'simulationType': 'RAS',
+            'RAS': {
                 'RASModel': 'kEpsilon',
-            }
+            },
+        }
+
+    def write_turbulence_properties(self):
+        write_foam_dict(self.foam_case_dir / 'constant/turbulenceProperties', self.get_turbulence_properties_dict())
+
+    def get_mesh_quality_dict(self):
+        return {
+            '#includeEtc': '"caseDicts/meshQualityDict"',
+        }
 
     def write_mesh_quality_dict(self):
-        with self.foam_case['system']['meshQualityDict'] as f:
-            f['#includeEtc'] = '"caseDicts/meshQualityDict"'
+        write_foam_dict(self.foam_case_dir / 'system/meshQualityDict', self.get_mesh_quality_dict())
+
+    def write_decompose_par_dict(self):
+        write_foam_dict(self.foam_case_dir / 'system/decomposeParDict', {
+            'numberOfSubdomains': self.n_procs,
+            'method': 'scotch',
+        })
 
     def write_surface_feature_extract_dict(self):
-        surfaces = []
-        for region in self.regions:
-            if region.get('object') is not None:
-                surfaces += region['object'].get_shm_geometry_dict().keys()
+        surfaces = list(self.get_shm_surfaces()[0].keys())
         with self.foam_case['system']['surfaceFeatureExtractDict'] as f:
             f['allFeatures'] = {
                 'surfaces': surfaces,
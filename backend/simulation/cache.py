@@ -0,0 +1,143 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from simulation.foam_files import write_foam_dict
+
+# Directory of the mesh cache below the simulations root.
+MESH_CACHE_DIR = '.mesh_cache'
+
+
+def settings_hash(*parts) -> str:
+    """Stable hash of JSON-like settings. Non-JSON values (e.g. foamlib dimension sets) are hashed by repr."""
+    h = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, bytes):
+            h.update(part)
+        else:
+            h.update(json.dumps(part, sort_keys=True, default=repr).encode())
+    return h.hexdigest()[:24]
+
+
+def _publish(tmp: Path, target: Path):
+    tmp.chmod(0o755)
+    # Renaming a finished directory into place is atomic, so concurrent writers never see a partial entry.
+    try:
+        os.rename(tmp, target)
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)
+        if not target.is_dir():
+            raise
+
+
+class CaseSkeletonStore:
+    """
+    Renders the static dictionaries of a case (schemes, solution settings, thermophysics, ...) once per
+    settings hash and clones them into new case directories.
+
+    Cloned files are hardlinked when possible, so they must never be edited in place inside a case.
+    """
+
+    def __init__(self, root: str | Path, link: bool = True):
+        self.root = Path(root)
+        self.link = link
+
+    def get(self, static_dicts: dict[str, dict]) -> Path:
+        path = self.root / settings_hash(static_dicts)
+        if path.is_dir():
+            return path
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = Path(tempfile.mkdtemp(prefix='.tmp_', dir=self.root))
+        for rel_path, entries in static_dicts.items():
+            write_foam_dict(tmp / rel_path, entries)
+        _publish(tmp, path)
+        return path
+
+    def clone(self, static_dicts: dict[str, dict], case_dir: str | Path) -> Path:
+        skeleton = self.get(static_dicts)
+        case_dir = Path(case_dir)
+        for rel_path in static_dicts.keys():
+            src = skeleton / rel_path
+            dst = case_dir / rel_path
+            dst.parent.mkdir(parents=True, exist_ok=True)
+            if dst.exists():
+                dst.unlink()
+            if self.link:
+                try:
+                    os.link(src, dst)
+                    continue
+                except OSError:
+                    pass
+            shutil.copy2(src, dst)
+        return skeleton
+
+
+class MeshCache:
+    """
+    Stores finished constant/polyMesh directories keyed by a hash of the geometry-relevant case inputs, so
+    cases that only differ in their boundary conditions can skip meshing entirely.
+
+    Restored meshes are hardlinked when possible, so mesh-modifying utilities must not run on a restored case.
+    """
+
+    def __init__(self, root: str | Path, link: bool = True):
+        self.root = Path(root)
+        self.link = link
+
+    def _copy_function(self):
+        if not self.link:
+            return shutil.copy2
+
+        def link_or_copy(src, dst):
+            try:
+                os.link(src, dst)
+            except OSError:
+                shutil.copy2(src, dst)
+        return link_or_copy
+
+    def restore(self, key: str, case_dir: str | Path) -> bool:
+        cached = self.root / key
+        if not cached.is_dir():
+            return False
+
+        target = Path(case_dir) / 'constant' / 'polyMesh'
+        shutil.rmtree(target, ignore_errors=True)
+        try:
+            shutil.copytree(cached, target, copy_function=self._copy_function())
+        except (OSError, shutil.Error):
+            # evicted while being copied, the case is meshed from scratch instead
+            shutil.rmtree(target, ignore_errors=True)
+            return False
+        # the mtime tells the retention pass which meshes are still in use
+        os.utime(cached)
+        return True
+
+    def store(self, key: str, case_dir: str | Path):
+        target = self.root / key
+        if target.is_dir():
+            return
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = Path(tempfile.mkdtemp(prefix='.tmp_', dir=self.root))
+        shutil.copytree(Path(case_dir) / 'constant' / 'polyMesh', tmp, dirs_exist_ok=True, copy_function=self._copy_function())
+        _publish(tmp, target)
+
+    def entries(self) -> list[Path]:
+        """The cached meshes, least recently stored or restored first."""
+        if not self.root.is_dir():
+            return []
+        paths = [path for path in self.root.iterdir() if path.is_dir() and not path.name.startswith('.')]
+        return sorted(paths, key=lambda path: path.stat().st_mtime)
+
+    def evict(self, path: Path):
+        """Removes a cached mesh. It is renamed away first, so no restore starts on a half-deleted entry."""
+        tmp = Path(tempfile.mkdtemp(prefix='.tmp_', dir=self.root))
+        try:
+            os.rename(path, tmp / path.name)
+        except OSError:
+            pass
+        shutil.rmtree(tmp, ignore_errors=True)
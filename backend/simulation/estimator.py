@@ -0,0 +1,222 @@
+import json
+import math
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from simulation.Simulation import Simulation
+from simulation.meshing import background_mesh_dims
+from simulation.objects.cutouts import BOX_FACE_NAMES
+
+BOUND_KEYS = ('x_min', 'x_max', 'y_min', 'y_max', 'z_min', 'z_max')
+# Layers of cells snappyHexMesh keeps at each refinement level next to a surface (nCellsBetweenLevels 1 plus the
+# cells cut by the surface).
+SURFACE_LAYERS = 3
+# Stages of a run that build the mesh; everything up to and including reconstructParMesh.
+MESH_APPS = ('blockMesh', 'surfaceFeatureExtract', 'snappyHexMesh', 'reconstructParMesh')
+
+# Job limits, unset means unlimited.
+MAX_JOB_HOURS = float(os.environ['SIMULATION_MAX_JOB_HOURS']) if 'SIMULATION_MAX_JOB_HOURS' in os.environ else None
+MAX_JOB_MEMORY_MB = (
+    float(os.environ['SIMULATION_MAX_MEMORY_MB']) if 'SIMULATION_MAX_MEMORY_MB' in os.environ else None
+)
+
+
+def face_area(bounds, face_name: str) -> float:
+    lengths = [bounds[1] - bounds[0], bounds[3] - bounds[2], bounds[5] - bounds[4]]
+    axis = 'xyz'.index(face_name[0])
+    return math.prod(length for i, length in enumerate(lengths) if i != axis)
+
+
+def estimate_cells(
+        regions: list[dict],
+        cell_size: float | None = None,
+        cell_budget: int | None = None,
+        refinement: str = 'uniform',
+        **kwargs
+) -> int:
+    """
+    Rough final cell count of a case: the background mesh, plus SURFACE_LAYERS layers of cells at every surface
+    refinement level up to each face's minimum level (flat faces are not refined further), plus the near-field boxes,
+    minus the background cells inside objects. Capped at maxGlobalCells like snappyHexMesh does.
+    """
+    room = next(region for region in regions if region['type'] == 'room')
+    room_bounds = [room[k] for k in BOUND_KEYS]
+    dims = background_mesh_dims(room_bounds, cell_size=cell_size, cell_budget=cell_budget)
+    background_cells = math.prod(dims)
+    volume = (room_bounds[1] - room_bounds[0]) * (room_bounds[3] - room_bounds[2]) * (room_bounds[5] - room_bounds[4])
+    h = (volume / background_cells) ** (1 / 3)
+
+    policy = Simulation.REFINEMENT_POLICIES[refinement]
+    cells = float(background_cells)
+    for region in regions:
+        if region['type'] == 'room':
+            continue
+        bounds = [region[k] for k in BOUND_KEYS]
+        cells -= (bounds[1] - bounds[0]) * (bounds[3] - bounds[2]) * (bounds[5] - bounds[4]) / h ** 3
+        for face_name in BOX_FACE_NAMES:
+            level = Simulation.get_face_refinement_levels(region, face_name, policy)[0]
+            cells += SURFACE_LAYERS * face_area(bounds, face_name) * sum(4 ** l for l in range(1, level + 1)) / h ** 2
+        if policy['near_field_depth'] is not None:
+            for face_name in Simulation.get_active_faces(region):
+                near_field_volume = face_area(bounds, face_name) * policy['near_field_depth']
+                cells += near_field_volume * (8 ** policy['near_field_level'] - 1) / h ** 3
+
+    max_cells = cell_budget if cell_budget is not None else Simulation.MAX_GLOBAL_CELLS
+    return int(min(max(cells, background_cells * 0.1), max_cells))
+
+
+class CostModel:
+    """
+    Per-cell cost coefficients of a run, in core-seconds and megabytes. The defaults are conservative guesses; fit()
+    replaces them with values measured from the manifests of finished runs.
+    """
+
+    def __init__(
+            self,
+            mesh_seconds_per_cell: float = 3e-4,
+            solver_seconds_per_cell_iteration: float = 2e-6,
+            mb_per_cell: float = 1.5e-3,
+            base_mb: float = 300.0,
+            overhead_seconds: float = 30.0,
+            iterations: int = 2000,
+            cell_scale: float = 1.0
+    ):
+        self.mesh_seconds_per_cell = mesh_seconds_per_cell
+        self.solver_seconds_per_cell_iteration = solver_seconds_per_cell_iteration
+        self.mb_per_cell = mb_per_cell
+        self.base_mb = base_mb
+        self.overhead_seconds = overhead_seconds
+        self.iterations = iterations
+        self.cell_scale = cell_scale
+
+    @classmethod
+    def fit(cls, manifests: list[dict]):
+        """Least-squares (through the origin) fit of the coefficients on completed runs with a known cell count."""
+        model = cls()
+        runs = [m for m in manifests if m.get('status') == 'completed' and m.get('cells')]
+        if not runs:
+            return model
+
+        cells = np.array([m['cells'] for m in runs], dtype=float)
+        n_procs = np.array([m.get('n_procs', 1) for m in runs], dtype=float)
+        stages = [m['stages'] for m in runs]
+        mesh_seconds = np.array([
+            sum(s['seconds'] for s in st if s['kind'] == 'command' and s['name'] in MESH_APPS) for st in stages
+        ])
+        solver_seconds = np.array([
+            sum(s['seconds'] for s in st if s['name'] == 'buoyantSimpleFoam') for st in stages
+        ])
+        iterations = np.array([m.get('iterations') or 0 for m in runs], dtype=float)
+        other_seconds = np.array([
+            sum(s['seconds'] for s in st if s['kind'] != 'command') for st in stages
+        ])
+
+        # runs that reused a cached mesh carry no meshing cost
+        meshed = mesh_seconds > 0
+        if meshed.any():
+            x = cells[meshed]
+            model.mesh_seconds_per_cell = float(x @ (mesh_seconds * n_procs)[meshed] / (x @ x))
+        solved = (solver_seconds > 0) & (iterations > 0)
+        if solved.any():
+            x = cells[solved] * iterations[solved]
+            model.solver_seconds_per_cell_iteration = float(x @ (solver_seconds * n_procs)[solved] / (x @ x))
+            model.iterations = int(np.median(iterations[solved]))
+        peak_mb = np.array([(m.get('peak_rss_mb') or {}).get('children', 0) for m in runs], dtype=float)
+        measured = peak_mb > model.base_mb
+        if measured.any():
+            model.mb_per_cell = float(np.median((peak_mb[measured] - model.base_mb) / cells[measured]))
+        model.overhead_seconds = float(np.median(other_seconds))
+        estimated = np.array([m.get('estimated_cells') or 0 for m in runs], dtype=float)
+        if (estimated > 0).any():
+            model.cell_scale = float(np.median(cells[estimated > 0] / estimated[estimated > 0]))
+        return model
+
+    @classmethod
+    def from_history(cls, root: str | Path = 'simulations'):
+        manifests = [read_manifest(path) for path in Path(root).glob('*/manifest.json')]
+        return cls.fit([m for m in manifests if m is not None])
+
+    def estimate(self, regions: list[dict], n_procs: int = 1, convergence=None, **kwargs) -> dict:
+        """Predicted cells, peak memory (MB) and wall time (s) of one run with the given Simulation keyword arguments."""
+        cells = int(estimate_cells(regions, **kwargs) * self.cell_scale)
+        iterations = self.iterations if convergence is not None else Simulation.END_TIME
+        # ideal scaling over the MPI ranks
+        core_seconds = cells * (self.mesh_seconds_per_cell + iterations * self.solver_seconds_per_cell_iteration)
+        return {
+            'cells': cells,
+            'memory_mb': self.base_mb * n_procs + self.mb_per_cell * cells,
+            'seconds': self.overhead_seconds + core_seconds / n_procs,
+            'runs': 1,
+        }
+
+
+def read_manifest(path: Path) -> dict | None:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class CostModelHistory:
+    """
+    CostModel.from_history for the request path. Only manifests written since the last call are parsed again, and
+    the model is refitted only when the set of completed runs changed, so a submission costs a stat per past run.
+    """
+
+    def __init__(self, root: str | Path = 'simulations'):
+        self.root = Path(root)
+        self.manifests: dict[Path, tuple[int, dict | None]] = {}
+        self.cached_model = None
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def completed(manifest: dict | None) -> bool:
+        return manifest is not None and manifest.get('status') == 'completed'
+
+    def model(self) -> CostModel:
+        with self.lock:
+            stale = self.cached_model is None
+            seen = set()
+            for path in self.root.glob('*/manifest.json'):
+                try:
+                    mtime = path.stat().st_mtime_ns
+                except OSError:
+                    continue
+                seen.add(path)
+                cached = self.manifests.get(path)
+                if cached is not None and cached[0] == mtime:
+                    continue
+                manifest = read_manifest(path)
+                self.manifests[path] = (mtime, manifest)
+                # manifests of running jobs are rewritten after every stage but do not enter the fit
+                stale |= self.completed(manifest) or (cached is not None and self.completed(cached[1]))
+            for path in set(self.manifests) - seen:
+                stale |= self.completed(self.manifests.pop(path)[1])
+
+            if stale:
+                self.cached_model = CostModel.fit([m for _, m in self.manifests.values() if m is not None])
+            return self.cached_model
+
+
+def combine_estimates(estimates: list[dict]) -> dict:
+    """Cost of running the estimated runs one after another."""
+    return {
+        'cells': max(e['cells'] for e in estimates),
+        'memory_mb': max(e['memory_mb'] for e in estimates),
+        'seconds': sum(e['seconds'] for e in estimates),
+        'runs': sum(e['runs'] for e in estimates),
+    }
+
+
+def budget_violation(estimate: dict, max_hours: float | None = MAX_JOB_HOURS,
+                     max_memory_mb: float | None = MAX_JOB_MEMORY_MB) -> str | None:
+    """Reason why a job with this estimate may not run, or None when it fits the budget."""
+    if max_hours is not None and estimate['seconds'] > max_hours * 3600:
+        return f"estimated run time {estimate['seconds'] / 3600:.1f} h exceeds the limit of {max_hours:g} h"
+    if max_memory_mb is not None and estimate['memory_mb'] > max_memory_mb:
+        return f"estimated memory {estimate['memory_mb']:.0f} MB exceeds the limit of {max_memory_mb:g} MB"
+    return None
@@ -0,0 +1,98 @@
+from collections.abc import Mapping
+from pathlib import Path
+
+import numpy as np
+from foamlib import FoamFile
+
+FIELD_CLASSES = {1: 'volScalarField', 3: 'volVectorField', 6: 'volSymmTensorField', 9: 'volTensorField'}
+
+
+def write_foam_dict(path: str | Path, entries: dict):
+    """Writes the top-level entries of an OpenFOAM dictionary in a single pass."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with FoamFile(path) as f:
+        for key, value in entries.items():
+            f[key] = value
+
+
+def time_directories(case_dir: str | Path) -> list[tuple[float, Path]]:
+    """Numeric time directories of a case, sorted by time."""
+    res = []
+    for path in Path(case_dir).iterdir():
+        if not path.is_dir():
+            continue
+        try:
+            res.append((float(path.name), path))
+        except ValueError:
+            continue
+    return sorted(res)
+
+
+def is_field_keyword(keyword: str) -> bool:
+    """Keywords whose values foamlib (and OpenFOAM) treat as fields, i.e. written as 'uniform <value>'."""
+    return keyword in ('value', 'gradient') or keyword.endswith('Value') or keyword.endswith('Gradient')
+
+
+def format_value(value) -> str:
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (bool, np.bool_)):
+        return 'yes' if value else 'no'
+    if isinstance(value, FoamFile.DimensionSet):
+        return '[' + ' '.join(f'{v:g}' for v in value) + ']'
+    if isinstance(value, (int, np.integer)):
+        return str(int(value))
+    if isinstance(value, (float, np.floating)):
+        return repr(float(value))
+    return '(' + ' '.join(format_value(v) for v in value) + ')'
+
+
+def format_field_value(value) -> str:
+    if isinstance(value, str):
+        return value
+    if np.ndim(value) == 0:
+        return 'uniform ' + repr(float(value))
+    return 'uniform (' + ' '.join(repr(float(v)) for v in value) + ')'
+
+
+def format_entries(entries: Mapping, depth: int = 0) -> list[str]:
+    indentation = '    ' * depth
+    lines = []
+    for keyword, value in entries.items():
+        if isinstance(value, Mapping):
+            lines += [f'{indentation}{keyword}', f'{indentation}{{', *format_entries(value, depth + 1), f'{indentation}}}']
+        elif is_field_keyword(keyword):
+            lines.append(f'{indentation}{keyword} {format_field_value(value)};')
+        else:
+            lines.append(f'{indentation}{keyword} {format_value(value)};')
+    return lines
+
+
+def write_field_file(path: str | Path, dimensions, internal_field, boundary_field: Mapping):
+    """
+    Writes a uniform initial-condition field file in one go. Rendering the few entry types of a boundary condition
+    directly avoids foamlib parsing every keyword and value it writes, which dominates case setup for many patches.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    lines = [
+        'FoamFile',
+        '{',
+        '    version 2.0;',
+        '    format ascii;',
+        f'    class {FIELD_CLASSES[int(np.size(internal_field))]};',
+        f'    location "{path.parent.name}";',
+        f'    object {path.name};',
+        '}',
+        '',
+        f'dimensions {format_value(dimensions)};',
+        '',
+        f'internalField {format_field_value(internal_field)};',
+        '',
+        'boundaryField',
+        '{',
+        *format_entries(boundary_field, 1),
+        '}',
+    ]
+    path.write_text('\n'.join(lines) + '\n')
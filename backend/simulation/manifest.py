@@ -0,0 +1,78 @@
+import gzip
+import json
+import os
+import re
+import resource
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+N_CELLS_RE = re.compile(rb'nCells:\s*(\d+)')
+
+
+def mesh_cell_count(case_dir: str | Path) -> int | None:
+    """Cell count from the note OpenFOAM writes into the header of constant/polyMesh/owner."""
+    poly_mesh = Path(case_dir) / 'constant' / 'polyMesh'
+    for name, opener in (('owner', open), ('owner.gz', gzip.open)):
+        if (poly_mesh / name).exists():
+            with opener(poly_mesh / name, 'rb') as f:
+                match = N_CELLS_RE.search(f.read(4096))
+            return int(match.group(1)) if match else None
+    return None
+
+
+def peak_rss_mb() -> dict[str, float]:
+    """Peak resident memory of this process and of the largest child it waited for (the OpenFOAM utilities)."""
+    # ru_maxrss is in kilobytes on Linux
+    return {
+        'self': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'children': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+    }
+
+
+class RunManifest:
+    """Machine-readable record of a run: wall time per stage, mesh size, solver iterations and peak memory."""
+
+    def __init__(self, path: str | Path, resume: bool = False):
+        """With resume, the record of the interrupted run at path is continued instead of replaced."""
+        self.path = Path(path)
+        self.data = {
+            'started': time.time(),
+            'stages': [],
+            'cells': None,
+            'iterations': None,
+            'peak_rss_mb': None,
+        }
+        if resume and self.path.exists():
+            try:
+                with open(self.path) as f:
+                    self.data.update(json.load(f))
+            except ValueError:
+                pass
+
+    @contextmanager
+    def stage(self, name: str, kind: str = 'write', **info):
+        """Times the enclosed block as a stage of the given kind ('write', 'command' or 'post')."""
+        entry = {'name': name, 'kind': kind, **info}
+        start = time.perf_counter()
+        try:
+            yield entry
+        finally:
+            entry['seconds'] = time.perf_counter() - start
+            self.data['stages'].append(entry)
+
+    def record(self, **entries):
+        self.data.update(entries)
+
+    def total_seconds(self, kind: str | None = None) -> float:
+        return sum(s['seconds'] for s in self.data['stages'] if kind is None or s['kind'] == kind)
+
+    def write(self):
+        self.data['peak_rss_mb'] = peak_rss_mb()
+        self.data['totals'] = {
+            kind: self.total_seconds(kind) for kind in sorted({s['kind'] for s in self.data['stages']})
+        }
+        tmp = self.path.with_suffix('.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(self.data, f, indent=2)
+        os.replace(tmp, self.path)
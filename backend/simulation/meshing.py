@@ -0,0 +1,45 @@
+import math
+from typing import Sequence
+
+# Share of the total cell budget given to the background mesh; the rest is left for snappyHexMesh refinement.
+BACKGROUND_CELL_FRACTION = 0.1
+
+
+def background_mesh_dims(
+        bounds: Sequence[float],
+        cell_size: float | None = None,
+        cell_budget: int | None = None
+) -> list[int]:
+    """
+    Block counts (nx, ny, nz) of the blockMesh background for (x_min, x_max, y_min, y_max, z_min, z_max) bounds.
+
+    With neither option the legacy sizing is used: two cells per room height horizontally and two in z. cell_size is
+    the target edge length of the (roughly cubic) background cells. cell_budget caps the background at
+    BACKGROUND_CELL_FRACTION of the total cell count, and sets the cell size on its own when cell_size is not given.
+    """
+    lengths = [bounds[1] - bounds[0], bounds[3] - bounds[2], bounds[5] - bounds[4]]
+    if cell_size is None and cell_budget is None:
+        return [int(lengths[0] // lengths[2]) * 2, int(lengths[1] // lengths[2]) * 2, 2]
+
+    background_budget = None
+    if cell_budget is not None:
+        background_budget = max(1, int(cell_budget * BACKGROUND_CELL_FRACTION))
+        budget_cell_size = (math.prod(lengths) / background_budget) ** (1 / 3)
+        cell_size = budget_cell_size if cell_size is None else max(cell_size, budget_cell_size)
+
+    dims = [max(1, round(length / cell_size)) for length in lengths]
+    # rounding can overshoot the budget slightly, coarsen until it fits
+    while background_budget is not None and math.prod(dims) > background_budget and max(dims) > 1:
+        cell_size *= 1.02
+        dims = [max(1, round(length / cell_size)) for length in lengths]
+    return dims
+
+
+def wall_grading(ratio: float | None):
+    """
+    blockMesh grading that refines towards the floor and the ceiling: z cells at the walls are `ratio` times smaller
+    than at mid-height. None or 1 gives uniform cells.
+    """
+    if ratio is None or ratio == 1:
+        return [1, 1, 1]
+    return [1, 1, [[0.5, 0.5, ratio], [0.5, 0.5, 1 / ratio]]]
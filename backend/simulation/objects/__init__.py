@@ -1,2 +1,2 @@
 from simulation.objects.simulation_object import SimulationObject
-from simulation.objects.cutouts import CutoutObject, cube, plane
+from simulation.objects.cutouts import CutoutObject, boxes, cube, plane
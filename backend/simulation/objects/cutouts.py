@@ -4,12 +4,45 @@ from typing import Sequence
 import numpy as np
 
 from simulation.objects.face import Face
+from simulation.objects.stl import polydata_from_triangles, write_solids
 from simulation.fields.boundary_conditions import BoundaryCondition
 from simulation.objects import SimulationObject
 
 import pyvista as pv
 
 
+BOX_FACE_NAMES = ('x_min', 'x_max', 'y_min', 'y_max', 'z_min', 'z_max')
+# Corner k of a box is (x[k & 1], y[k >> 1 & 1], z[k >> 2 & 1]); each quad is ordered so its normal points outwards.
+BOX_FACE_QUADS = np.array([
+    [0, 4, 6, 2],
+    [1, 3, 7, 5],
+    [0, 1, 5, 4],
+    [2, 6, 7, 3],
+    [0, 2, 3, 1],
+    [4, 5, 7, 6],
+])
+BOX_FACE_TRIANGLES = np.stack([BOX_FACE_QUADS[:, [0, 1, 2]], BOX_FACE_QUADS[:, [0, 2, 3]]], axis=1)
+
+
+def box_face_triangles(bounds) -> np.ndarray:
+    """
+    Surface triangles of axis-aligned boxes given as an (N, 6) array of (x_min, x_max, y_min, y_max, z_min, z_max)
+    bounds. Returns an (N, 6, 2, 3, 3) array: two triangles for each face, in BOX_FACE_NAMES order.
+    """
+    bounds = np.asarray(bounds, dtype=float).reshape(-1, 6)
+    k = np.arange(8)
+    corners = np.stack([
+        bounds[:, 0:2][:, k & 1],
+        bounds[:, 2:4][:, k >> 1 & 1],
+        bounds[:, 4:6][:, k >> 2 & 1],
+    ], axis=-1)
+    return corners[:, BOX_FACE_TRIANGLES]
+
+
+def joined_face_name(name: str, face_name: str, sep: str | None) -> str:
+    return face_name if sep is None else name + sep + face_name
+
+
 class CutoutObject(SimulationObject):
     names = []
 
@@ -25,30 +58,66 @@ class CutoutObject(SimulationObject):
         # mesh will have face names set as cell_data
         super().__init__(name, check_name)
 
-        self.mesh = mesh.triangulate()
+        self._mesh = mesh.triangulate()
 
         face_names = face_bc_mappings.keys()
         self.faces = []
         for face_name in face_names:
-            if sep is not None:
-                joined_name = name + sep + face_name
-            else:
-                joined_name = face_name
             self.faces.append(
                 Face(
-                    joined_name,
+                    joined_face_name(name, face_name, sep),
                     face_bc_mappings[face_name],
                     mesh.extract_cells(np.where(mesh.cell_data['face_names'] == face_name)[0]).extract_geometry()
                 )
             )
 
         if sep is not None:
-            self.mesh.cell_data['face_names'] = [
+            self._mesh.cell_data['face_names'] = [
                 name + sep + face_name
-                for face_name in self.mesh.cell_data['face_names']
+                for face_name in self._mesh.cell_data['face_names']
             ]
 
-    def write_stls(self, directory: str | Path, create_subfolder: bool = False):
+    @classmethod
+    def from_face_triangles(
+            cls,
+            name: str,
+            face_triangles: dict[str, np.ndarray],
+            face_bc_mappings: dict[str, dict[str, BoundaryCondition]],
+            sep: str = '_',
+            check_name=True
+    ):
+        """
+        Builds the object straight from (n, 3, 3) triangles per face name, skipping the pyvista cell extraction. The
+        combined mesh is only assembled if something asks for it.
+        """
+        obj = cls.__new__(cls)
+        SimulationObject.__init__(obj, name, check_name)
+        obj._mesh = None
+        obj.faces = [
+            Face(
+                joined_face_name(name, face_name, sep),
+                face_bc_mappings[face_name],
+                triangles=face_triangles[face_name]
+            )
+            for face_name in face_bc_mappings.keys()
+        ]
+        return obj
+
+    @property
+    def mesh(self) -> pv.PolyData:
+        if self._mesh is None:
+            self._mesh = polydata_from_triangles(np.concatenate([face.triangles() for face in self.faces]))
+            self._mesh.cell_data['face_names'] = np.repeat(
+                [face.name for face in self.faces],
+                [len(face.triangles()) for face in self.faces]
+            )
+        return self._mesh
+
+    @mesh.setter
+    def mesh(self, mesh: pv.PolyData):
+        self._mesh = mesh
+
+    def write_stls(self, directory: str | Path, create_subfolder: bool = False, combined: bool = False):
         directory = Path(directory)
         if not directory.exists():
             raise ValueError(f'Directory {directory} does not exist')
@@ -58,17 +127,32 @@ class CutoutObject(SimulationObject):
         if create_subfolder:
             directory = directory / self.name
         directory.mkdir(parents=False, exist_ok=True)
+        if combined:
+            write_solids(directory / f'{self.name}.stl', [(face.name, face.triangles()) for face in self.faces])
+            return
         for face in self.faces:
             face.write_stl(directory)
 
-    def get_shm_geometry_dict(self):
+    def get_shm_geometry_dict(self, combined: bool = False):
+        if combined:
+            return faces_shm_geometry_dict(self.name, self.faces)
+
         res = {}
         for face in self.faces:
             res.update(face.get_shm_geometry_dict())
 
         return res
 
-    def get_shm_refinement_dict(self):
+    def get_shm_searchable_geometry_dict(self):
+        res = {}
+        for face in self.faces:
+            res.update(face.get_shm_searchable_geometry_dict())
+        return res
+
+    def get_shm_refinement_dict(self, combined: bool = False):
+        if combined:
+            return faces_shm_refinement_dict(self.name, self.faces)
+
         res = {}
         for face in self.faces:
             res.update(face.get_shm_refinement_dict())
@@ -96,24 +180,55 @@ class CutoutObject(SimulationObject):
         return res
 
 
-def cube(bounds: Sequence[float], bc_mappings: dict[str, dict[str, BoundaryCondition]], name: str = 'cube', **kwargs):
-    face_names = [
-        "x_min",
-        "x_max",
-        "y_min",
-        "y_max",
-        "z_min",
-        "z_max",
-    ]
+def faces_shm_geometry_dict(name: str, faces: list[Face]):
+    """Geometry entry for a multi-solid STL with one solid per face, each named (and patched) after its face."""
+    return {
+        f'{name}.stl': {
+            'type': 'triSurfaceMesh',
+            'name': name,
+            'regions': {face.name: {'name': face.name} for face in faces},
+        }
+    }
+
 
-    for face_name in face_names:
-        if face_name not in bc_mappings.keys():
-            raise ValueError(f'Boundary condition not defined for face {face_name}')
+def faces_shm_refinement_dict(name: str, faces: list[Face]):
+    return {
+        name: {
+            'level': np.min([face.refinement_levels for face in faces], axis=0).tolist(),
+            'regions': {face.name: {'level': face.refinement_levels} for face in faces},
+        }
+    }
 
-    mesh = pv.Cube(bounds=bounds)
-    mesh.cell_data['face_names'] = face_names
 
-    return CutoutObject(name, mesh, bc_mappings, **kwargs)
+def boxes(
+        bounds,
+        bc_mappings: Sequence[dict[str, dict[str, BoundaryCondition]]],
+        names: Sequence[str],
+        **kwargs
+) -> list[CutoutObject]:
+    """Axis-aligned box objects for an (N, 6) bounds array, with the triangles of all boxes generated at once."""
+    for box_bc_mappings in bc_mappings:
+        for face_name in BOX_FACE_NAMES:
+            if face_name not in box_bc_mappings.keys():
+                raise ValueError(f'Boundary condition not defined for face {face_name}')
+
+    triangles = box_face_triangles(bounds)
+    if not len(triangles) == len(bc_mappings) == len(names):
+        raise ValueError('bounds, bc_mappings and names must have the same length')
+
+    return [
+        CutoutObject.from_face_triangles(
+            name,
+            dict(zip(BOX_FACE_NAMES, box_triangles)),
+            box_bc_mappings,
+            **kwargs
+        )
+        for name, box_triangles, box_bc_mappings in zip(names, triangles, bc_mappings)
+    ]
+
+
+def cube(bounds: Sequence[float], bc_mappings: dict[str, dict[str, BoundaryCondition]], name: str = 'cube', **kwargs):
+    return boxes([bounds], [bc_mappings], [name], **kwargs)[0]
 
 
 def plane(
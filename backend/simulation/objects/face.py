@@ -1,6 +1,9 @@
 from typing import Sequence
 
+import numpy as np
+
 from simulation.fields.boundary_conditions import BoundaryCondition
+from simulation.objects.stl import polydata_from_triangles, write_binary_stl
 import pyvista as pv
 from pathlib import Path
 
@@ -10,14 +13,25 @@ class Face:
             self,
             name:str,
             bc_dict: dict[str, BoundaryCondition],
-            mesh: pv.PolyData,
-            refinement_levels: Sequence[int]=(2,3)
+            mesh: pv.PolyData | None = None,
+            refinement_levels: Sequence[int]=(2,3),
+            triangles: np.ndarray | None = None
     ):
+        # either a mesh or its (n, 3, 3) surface triangles; the other one is derived on first use
+        if mesh is None and triangles is None:
+            raise ValueError(f'Face {name} needs a mesh or triangles')
         self.name = name
         self.bc_dict = bc_dict
-        self.mesh = mesh
+        self._mesh = mesh
+        self._triangles = triangles
         self.refinement_levels = list(refinement_levels)
 
+    @property
+    def mesh(self) -> pv.PolyData:
+        if self._mesh is None:
+            self._mesh = polydata_from_triangles(self._triangles)
+        return self._mesh
+
     def update_bcs(self, update: dict[str, BoundaryCondition]) -> None:
         self.bc_dict.update(update)
 
@@ -28,8 +42,16 @@ class Face:
         if path.is_dir():
             path = path / (self.name + '.stl')
 
-        triangulated_mesh = self.mesh.triangulate()
-        triangulated_mesh.save(path)
+        write_binary_stl(path, self.triangles())
+
+    def triangles(self) -> np.ndarray:
+        """Surface triangles as an (n, 3, 3) array of vertex coordinates."""
+        if self._triangles is None:
+            triangulated_mesh = self.mesh.triangulate()
+            self._triangles = np.asarray(triangulated_mesh.points)[
+                np.asarray(triangulated_mesh.faces).reshape(-1, 4)[:, 1:]
+            ]
+        return self._triangles
 
     def get_bcs_foam_dict(self):
         return {
@@ -44,6 +66,21 @@ class Face:
             }
         }
 
+    def get_shm_searchable_geometry_dict(self):
+        """Analytic searchablePlate entry spanning the face, for axis-aligned planar faces."""
+        triangles = self.triangles()
+        origin = triangles.min(axis=(0, 1))
+        span = triangles.max(axis=(0, 1)) - origin
+        if np.count_nonzero(np.isclose(span, 0)) != 1:
+            raise ValueError(f'Face {self.name} is not an axis-aligned rectangle')
+        return {
+            self.name: {
+                'type': 'searchablePlate',
+                'origin': origin.tolist(),
+                'span': np.where(np.isclose(span, 0), 0, span).tolist(),
+            }
+        }
+
     def get_shm_refinement_dict(self):
         return {
             self.name: {
@@ -0,0 +1,54 @@
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+import pyvista as pv
+
+# Binary STL record: normal, three vertices and the (unused) attribute byte count.
+STL_FACET = np.dtype([('normal', '<f4', (3,)), ('vertices', '<f4', (3, 3)), ('attribute', '<u2')])
+
+ASCII_FACET = (
+    '  facet normal %.9g %.9g %.9g\n'
+    '    outer loop\n'
+    '      vertex %.9g %.9g %.9g\n'
+    '      vertex %.9g %.9g %.9g\n'
+    '      vertex %.9g %.9g %.9g\n'
+    '    endloop\n'
+    '  endfacet\n'
+)
+
+
+def facet_normals(triangles: np.ndarray) -> np.ndarray:
+    normals = np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0])
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    return normals / np.where(lengths > 0, lengths, 1)
+
+
+def polydata_from_triangles(triangles: np.ndarray) -> pv.PolyData:
+    """(n, 3, 3) triangles as a PolyData with three unshared points per triangle."""
+    n = len(triangles)
+    connectivity = np.column_stack([np.full(n, 3), np.arange(3 * n).reshape(-1, 3)])
+    return pv.PolyData(np.asarray(triangles, dtype=float).reshape(-1, 3), faces=connectivity.ravel())
+
+
+def write_binary_stl(path: str | Path, triangles: np.ndarray) -> None:
+    facets = np.zeros(len(triangles), dtype=STL_FACET)
+    facets['normal'] = facet_normals(triangles)
+    facets['vertices'] = triangles
+    with open(path, 'wb') as f:
+        f.write(b'binary STL'.ljust(80, b' '))
+        f.write(np.uint32(len(facets)).tobytes())
+        facets.tofile(f)
+
+
+def write_solids(path: str | Path, solids: Iterable[tuple[str, np.ndarray]]) -> None:
+    """
+    Writes (name, (n, 3, 3) triangles) pairs as a single ASCII STL file with one named solid each. snappyHexMesh and
+    surfaceFeatureExtract read every solid as a separate region of the surface.
+    """
+    with open(path, 'w') as f:
+        for name, triangles in solids:
+            rows = np.column_stack([facet_normals(triangles), np.reshape(triangles, (-1, 9))])
+            f.write(f'solid {name}\n')
+            f.write(''.join(ASCII_FACET % tuple(row) for row in rows.tolist()))
+            f.write(f'endsolid {name}\n')
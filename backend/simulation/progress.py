@@ -0,0 +1,76 @@
+import time
+
+from simulation.supervisor import RESIDUAL_RE, TIME_RE, parse_float
+
+# Rough share of the wall time of a run spent in each OpenFOAM stage, in execution order.
+STAGE_WEIGHTS = {
+    'blockMesh': 0.01,
+    'surfaceFeatureExtract': 0.01,
+    'decomposePar': 0.01,
+    'snappyHexMesh': 0.2,
+    'reconstructParMesh': 0.01,
+    'mapFields': 0.01,
+    'buoyantSimpleFoam': 0.73,
+    'reconstructPar': 0.02,
+}
+
+
+class ProgressTracker:
+    """Parses the OpenFOAM logs as they are written and publishes the progress of the run through a callback."""
+
+    def __init__(self, callback, end_time: int, min_interval: float = 1.0):
+        self.callback = callback
+        self.end_time = end_time
+        self.min_interval = min_interval
+
+        self.stage = None
+        self.iteration = 0
+        self.residuals: dict[str, float] = {}
+        self._iteration_residuals: dict[str, float] = {}
+        self._last_publish = 0.0
+
+    def start_stage(self, stage: str):
+        self.stage = stage
+        self.iteration = 0
+        self.residuals = {}
+        self._iteration_residuals = {}
+        self.publish(force=True)
+
+    def feed(self, line: str):
+        match = TIME_RE.match(line)
+        if match:
+            self.iteration = int(parse_float(match.group(1)))
+            if self._iteration_residuals:
+                self.residuals = self._iteration_residuals
+            self._iteration_residuals = {}
+            self.publish()
+            return
+
+        match = RESIDUAL_RE.search(line)
+        if match:
+            self._iteration_residuals.setdefault(match.group(1), parse_float(match.group(2)))
+
+    def fraction(self) -> float:
+        done = 0.0
+        for stage, weight in STAGE_WEIGHTS.items():
+            if stage == self.stage:
+                if stage == 'buoyantSimpleFoam':
+                    done += weight * min(self.iteration / self.end_time, 1.0)
+                break
+            done += weight
+        return round(done / sum(STAGE_WEIGHTS.values()), 4)
+
+    def snapshot(self) -> dict:
+        return {
+            'stage': self.stage,
+            'iteration': self.iteration,
+            'residuals': self.residuals,
+            'fraction': self.fraction(),
+        }
+
+    def publish(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._last_publish < self.min_interval:
+            return
+        self._last_publish = now
+        self.callback(self.snapshot())
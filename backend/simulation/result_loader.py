@@ -0,0 +1,78 @@
+from collections import OrderedDict
+from pathlib import Path
+
+import pyvista as pv
+
+from simulation.foam_files import time_directories
+
+# Number of time steps a ResultCache keeps in memory. A large case takes hundreds of megabytes, so only the few that
+# post-processing is working on are kept.
+RESULT_CACHE_SIZE = 4
+
+
+class ResultDataset:
+    """The internal mesh and boundary patches of one time step, with every written field as cell and point data."""
+
+    def __init__(self, time: float, internal_mesh: pv.UnstructuredGrid, patches: dict[str, pv.PolyData]):
+        self.time = time
+        self.internal_mesh = internal_mesh
+        self.patches = patches
+
+
+def resolve_time(case_dir: Path, t: int | float = -1) -> tuple[float, Path]:
+    """Time step t, given like foamlib as an index into the written times (-1 the latest) or as a float time value."""
+    times = time_directories(case_dir)
+    if not times:
+        raise FileNotFoundError(f'No time directories in {case_dir}')
+    if isinstance(t, float):
+        return next((time, path) for time, path in times if time == t)
+    return times[t]
+
+
+def read_dataset(case_dir: Path, time: float) -> ResultDataset:
+    foam_file = case_dir / f'{case_dir.name}.foam'
+    foam_file.touch()
+    reader = pv.OpenFOAMReader(str(foam_file))
+    reader.set_active_time_value(time)
+    data = reader.read()
+    internal_mesh = data['internalMesh']
+    if internal_mesh is None:
+        raise ValueError(f'Failed to read internalMesh of {case_dir} at time {time:g}')
+    boundary = data['boundary']
+    patches = {name: boundary[name] for name in boundary.keys() if name != 'defaultFaces'}
+    return ResultDataset(time, internal_mesh, patches)
+
+
+class ResultCache:
+    """
+    The results of one case, each time step read from disk once and shared by every consumer. Owned by whoever
+    post-processes the case (see Results), so the datasets are freed with it or by clear().
+    """
+
+    def __init__(self, case_dir: str | Path, size: int = RESULT_CACHE_SIZE):
+        self.case_dir = Path(case_dir).absolute()
+        self.size = size
+        self.datasets: OrderedDict[tuple, ResultDataset] = OrderedDict()
+
+    def load(self, t: int | float = -1) -> ResultDataset:
+        """
+        Time step t of the case. A time step that is rewritten (e.g. by a resumed solver) is read again. Consumers
+        must not modify the returned meshes in place.
+        """
+        time, time_dir = resolve_time(self.case_dir, t)
+        key = (time, time_dir.stat().st_mtime_ns)
+        if key in self.datasets:
+            self.datasets.move_to_end(key)
+            return self.datasets[key]
+
+        dataset = read_dataset(self.case_dir, time)
+        # older versions of the same time step are stale
+        for stale in [k for k in self.datasets if k[0] == time]:
+            del self.datasets[stale]
+        self.datasets[key] = dataset
+        while len(self.datasets) > self.size:
+            self.datasets.popitem(last=False)
+        return dataset
+
+    def clear(self):
+        self.datasets.clear()
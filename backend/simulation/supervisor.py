@@ -0,0 +1,136 @@
+import math
+import re
+import time
+from collections import deque
+
+TIME_RE = re.compile(r'^Time = (\S+)')
+RESIDUAL_RE = re.compile(r'Solving for (\w+), Initial residual = ([^,]+), Final residual = ([^,]+), No Iterations (\d+)')
+MAX_RE = re.compile(r'max\((\w+)\) = (\S+)')
+# Iterations and seconds a solver gets to act on a stop request before it is terminated. The log is read with some
+# lag behind a fast solver, so the iterations alone would terminate solvers that are already writing their results.
+STOP_GRACE_ITERATIONS = 50
+STOP_GRACE_SECONDS = 60.0
+
+
+def parse_float(value: str) -> float:
+    try:
+        return float(value)
+    except ValueError:
+        return math.nan
+
+
+class ConvergenceCriteria:
+    def __init__(
+            self,
+            residual_tol: float = 1e-4,
+            monitor_field: str = 'T',
+            monitor_window: int = 200,
+            monitor_tol: float = 0.05,
+            min_iterations: int = 300,
+            divergence_residual: float = 1e2,
+            divergence_value: float = 1000.0
+    ):
+        """
+        A run is stopped once, after min_iterations, either every initial residual is below residual_tol or
+        max(monitor_field) moved less than monitor_tol over the last monitor_window iterations. It is killed as soon as
+        a residual or the monitored value is NaN, or exceeds divergence_residual or divergence_value respectively.
+        """
+        self.residual_tol = residual_tol
+        self.monitor_field = monitor_field
+        self.monitor_window = monitor_window
+        self.monitor_tol = monitor_tol
+        self.min_iterations = min_iterations
+        self.divergence_residual = divergence_residual
+        self.divergence_value = divergence_value
+
+
+class SolverSupervisor:
+    """
+    Follows a streaming solver log and decides when the run has converged (stop) or diverged (kill), and when a
+    solver that was asked to stop kept iterating (terminate).
+    """
+
+    def __init__(self, criteria: ConvergenceCriteria, stop_grace_seconds: float = STOP_GRACE_SECONDS):
+        self.criteria = criteria
+        self.stop_grace_seconds = stop_grace_seconds
+        self.iteration = 0
+        self.residuals: dict[str, float] = {}
+        self.monitor_history = deque(maxlen=criteria.monitor_window)
+        self.converged = False
+        self.diverged = False
+        self.reason = None
+        self.stopped_at = None
+        self.stop_requested = None
+        self.terminated = False
+
+    def feed(self, line: str) -> str | None:
+        """
+        Parses one log line. Returns 'stop' or 'kill' when the run should end, or 'terminate' when it still runs
+        STOP_GRACE_ITERATIONS iterations and stop_grace_seconds after the stop; each at most once.
+        """
+        if self.diverged or self.terminated:
+            return None
+
+        match = TIME_RE.match(line)
+        if match and self.converged:
+            # iterations are still counted after the stop, to notice a solver that ignores it
+            self.iteration = int(parse_float(match.group(1)))
+            if (self.iteration - self.stopped_at > STOP_GRACE_ITERATIONS
+                    and time.monotonic() - self.stop_requested > self.stop_grace_seconds):
+                self.terminated = True
+                return 'terminate'
+            return None
+        if self.converged:
+            return None
+
+        if match:
+            # A new iteration starts, so the previous one is complete.
+            action = self._check_plateau()
+            self.iteration = int(parse_float(match.group(1)))
+            self.residuals = {}
+            if action == 'stop':
+                self.stopped_at = self.iteration
+                self.stop_requested = time.monotonic()
+            return action
+
+        match = RESIDUAL_RE.search(line)
+        if match:
+            field, initial = match.group(1), parse_float(match.group(2))
+            # Only the first solve of a field per iteration carries the residual the solver itself checks.
+            self.residuals.setdefault(field, initial)
+            if not math.isfinite(initial) or initial > self.criteria.divergence_residual:
+                return self._diverge(f'{field} initial residual {match.group(2)} at iteration {self.iteration}')
+            return None
+
+        match = MAX_RE.search(line)
+        if match and match.group(1) == self.criteria.monitor_field:
+            value = parse_float(match.group(2))
+            if not math.isfinite(value) or abs(value) > self.criteria.divergence_value:
+                return self._diverge(f'max({match.group(1)}) = {match.group(2)} at iteration {self.iteration}')
+            self.monitor_history.append(value)
+        return None
+
+    def _check_plateau(self):
+        if self.iteration < self.criteria.min_iterations:
+            return None
+
+        if self.residuals and max(self.residuals.values()) < self.criteria.residual_tol:
+            self.converged = True
+            self.reason = f'residuals below {self.criteria.residual_tol} at iteration {self.iteration}'
+            return 'stop'
+
+        if len(self.monitor_history) == self.monitor_history.maxlen:
+            spread = max(self.monitor_history) - min(self.monitor_history)
+            if spread < self.criteria.monitor_tol:
+                self.converged = True
+                self.reason = (
+                    f'max({self.criteria.monitor_field}) changed by {spread:.3g} over the last '
+                    f'{self.criteria.monitor_window} iterations at iteration {self.iteration}'
+                )
+                return 'stop'
+        return None
+
+    def _diverge(self, reason):
+        self.diverged = True
+        self.reason = reason
+        return 'kill'
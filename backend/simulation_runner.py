@@ -5,6 +5,59 @@ from pathlib import Path
 
 # NEW: Import the Simulation class from the new library
 from simulation.Simulation import Simulation
+from simulation.cache import MESH_CACHE_DIR, CaseSkeletonStore, MeshCache, settings_hash
+from simulation.estimator import CostModel, estimate_cells
+from simulation.supervisor import ConvergenceCriteria
+
+# Static case files are rendered once per settings hash and shared by every run (see CaseSkeletonStore).
+# Absolute because the GA runner changes the working directory while it runs.
+CASE_SKELETONS = CaseSkeletonStore(os.path.abspath(os.path.join('simulations', '.skeletons')))
+# Meshes are reused across runs whose geometry and meshing dictionaries hash identically (see MeshCache).
+MESH_CACHE = MeshCache(os.path.abspath(os.path.join('simulations', MESH_CACHE_DIR)))
+# Number of MPI subdomains per run; 1 runs every OpenFOAM utility serially.
+N_PROCS = int(os.environ.get('SIMULATION_N_PROCS', '1'))
+# Solver iterations between the checkpoints a resumed run restarts from.
+CHECKPOINT_INTERVAL = int(os.environ.get('SIMULATION_CHECKPOINT_INTERVAL', '500'))
+
+
+def simulation_kwargs(**overrides) -> dict:
+    """Keyword arguments shared by every Simulation the runners create."""
+    kwargs = {
+        'skeleton_store': CASE_SKELETONS,
+        'mesh_cache': MESH_CACHE,
+        'output_profile': 'binary',
+        'n_procs': N_PROCS,
+        'convergence': ConvergenceCriteria(),
+    }
+    kwargs.update(overrides)
+    return kwargs
+
+
+# Keys of the job config's optional 'mesh' section, the Simulation arguments sizing the mesh (see meshing.py) and
+# choosing its refinement policy (one of Simulation.REFINEMENT_POLICIES).
+MESH_KEYS = ('cell_size', 'cell_budget', 'wall_grading_ratio', 'refinement')
+
+
+def mesh_kwargs(config: dict) -> dict:
+    """Simulation arguments from the 'mesh' section of a job config; unset keys keep the Simulation defaults."""
+    mesh = config.get('mesh') or {}
+    unknown = set(mesh) - set(MESH_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown mesh settings {sorted(unknown)}")
+    if mesh.get('refinement') is not None and mesh['refinement'] not in Simulation.REFINEMENT_POLICIES:
+        raise ValueError(f"Unknown refinement policy {mesh['refinement']}")
+    return {key: mesh[key] for key in MESH_KEYS if mesh.get(key) is not None}
+
+
+def progress_publisher(progress_db, run_id, **extra):
+    """Callback that stores the live progress of a run in progress_db, or None when progress is not tracked."""
+    if progress_db is None:
+        return None
+
+    def publish(progress):
+        progress_db[run_id] = {**progress, **extra}
+    return publish
+
 
 def transform_config(config: dict) -> list[dict]:
     """
@@ -73,12 +126,48 @@ def transform_config(config: dict) -> list[dict]:
     return regions
 
 
-def run_openfoam_simulation(config, run_id, simulations_db, is_optimization_run=False):
+def normalize_value(value):
+    """
+    Numbers as floats with 12 significant digits, so 2 and 2.0 (or float noise from the UI) hash the same. Settings
+    objects such as ConvergenceCriteria are taken by their attributes.
+    """
+    if isinstance(value, dict):
+        return {k: normalize_value(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [normalize_value(v) for v in value]
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(f'{value:.12g}')
+    if hasattr(value, '__dict__') and not callable(value):
+        return normalize_value(vars(value))
+    return value
+
+
+def config_hash(kind: str, config: dict, settings: dict | None = None) -> str:
+    """
+    Content address of a job: its kind, the whole job config as submitted, the kind's own settings (search bounds, GA
+    parameters) and the solver options that shape the result. Identical hashes give identical results.
+    """
+    options = simulation_kwargs()
+    return settings_hash(
+        kind, normalize_value(config), normalize_value(settings or {}),
+        options['output_profile'], normalize_value(options['convergence'])
+    )
+
+
+def estimate_simulation(config, model: CostModel) -> dict:
+    """Predicted cost of run_openfoam_simulation for this config."""
+    return model.estimate(transform_config(config), **simulation_kwargs(**mesh_kwargs(config)))
+
+
+def run_openfoam_simulation(config, run_id, simulations_db, is_optimization_run=False, progress_db=None,
+                            resume=False):
     """
     Orchestrates an OpenFOAM simulation using the new modular Simulation class.
     The 'is_optimization_run' flag is not used internally here, but adding it
     to the function signature allows the optimization runner to call this function
     without causing an argument mismatch error.
+    With 'resume', an interrupted run continues in its existing case: finished stages are skipped and the solver
+    restarts from its latest checkpoint.
     """
     run_path = Path(os.path.abspath(os.path.join('simulations', run_id)))
     log_path = run_path / 'simulation_runner.log'
@@ -87,22 +176,32 @@ def run_openfoam_simulation(config, run_id, simulations_db, is_optimization_run=
     if not is_optimization_run:
         run_path.mkdir(parents=True, exist_ok=True)
 
+    sim = None
     try:
         # For an optimization run, the status is already 'running_optimization', 
         # so we don't want to overwrite it back to 'running'.
         if not is_optimization_run:
             simulations_db[run_id] = "running" # Set status for normal runs
 
-        with open(log_path, 'w') as log_file:
+        with open(log_path, 'a' if resume else 'w') as log_file:
             log_file.write(f"[{run_id}] Starting simulation setup...\n")
             
             # 1. Transform the input config to the new format
             log_file.write("Transforming configuration...\n")
             sim_config = transform_config(config)
+            sim_kwargs = simulation_kwargs(**mesh_kwargs(config))
 
             # 2. Instantiate the main Simulation object
             log_file.write(f"Initializing simulation in: {run_path}\n")
-            sim = Simulation(inp=sim_config, foam_case_dir=run_path, overwrite=True)
+            sim = Simulation(
+                inp=sim_config, foam_case_dir=run_path, overwrite=True, resume=resume,
+                checkpoint_interval=CHECKPOINT_INTERVAL,
+                **sim_kwargs, progress_callback=progress_publisher(progress_db, run_id)
+            )
+            if sim.resumed:
+                log_file.write(f"Resuming from time {sim.latest_time():g}.\n")
+            # Lets CostModel.fit calibrate the cell estimate against the real mesh.
+            sim.manifest.record(estimated_cells=estimate_cells(sim_config, **sim_kwargs))
 
             # 3. Write all OpenFOAM case files
             log_file.write("Writing OpenFOAM case files...\n")
@@ -117,8 +216,16 @@ def run_openfoam_simulation(config, run_id, simulations_db, is_optimization_run=
             # 5. Process and convert results to GLTF
             log_file.write("Simulation finished. Converting results to glTF...\n")
             log_file.flush()
-            results = sim.get_results()
-            if results.convert_results_to_gltf():
+            with sim.manifest.stage('convert_results_to_gltf', 'post'):
+                results = sim.get_results()
+                converted = results.convert_results_to_gltf()
+            if converted:
+                # served from the dataset the glTF conversion already loaded
+                with sim.manifest.stage('statistics', 'post'):
+                    sim.manifest.record(statistics=results.statistics())
+            sim.manifest.record(status="completed" if converted else "failed")
+            sim.manifest.write()
+            if converted:
                 log_file.write("Result conversion successful.\n")
                 simulations_db[run_id] = "completed"
             else:
@@ -134,4 +241,7 @@ def run_openfoam_simulation(config, run_id, simulations_db, is_optimization_run=
         with open(log_path, 'a') as log_file:
             log_file.write(f"\n{error_message}\n")
             traceback.print_exc(file=log_file)
-        simulations_db[run_id] = "failed"
\ No newline at end of file
+        simulations_db[run_id] = "failed"
+        if sim is not None:
+            sim.manifest.record(status="failed", error=str(e))
+            sim.manifest.write()
\ No newline at end of file
@@ -0,0 +1,23 @@
+import multiprocessing
+import os
+
+from governor import available_cores, parse_cpu_list
+
+
+def report_cores(cores, conn):
+    os.sched_setaffinity(0, cores)
+    # what a server process started by the pinned web process (the debug reloader) sees
+    conn.send(available_cores())
+
+
+def test_parse_cpu_list():
+    assert parse_cpu_list('0-3,8,10-11\n') == [0, 1, 2, 3, 8, 10, 11]
+
+
+def test_available_cores_ignore_the_affinity():
+    machine = available_cores()
+    receiver, sender = multiprocessing.get_context('fork').Pipe(duplex=False)
+    child = multiprocessing.get_context('fork').Process(target=report_cores, args=(machine[:1], sender))
+    child.start()
+    assert receiver.recv() == machine
+    child.join()
@@ -0,0 +1,29 @@
+import multiprocessing
+import os
+
+from job_registry import JobRegistry
+
+
+def write_from_job(registry: JobRegistry, scratch: str):
+    # what run_ga_optimization does: change into its temp dir, then report status and progress
+    os.chdir(scratch)
+    registry['run'] = 'running_optimization'
+    registry.progress['run'] = {'stage': 'ga'}
+    registry['run'] = 'completed'
+
+
+def test_relative_path_survives_chdir_in_job(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    registry = JobRegistry(os.path.join('simulations', 'jobs.sqlite3'))
+    registry.create('run', 'ga')
+    scratch = tmp_path / 'ga_temp'
+    scratch.mkdir()
+
+    job = multiprocessing.get_context('fork').Process(target=write_from_job, args=(registry, str(scratch)))
+    job.start()
+    job.join()
+
+    assert job.exitcode == 0
+    assert registry['run'] == 'completed'
+    assert registry.progress.get('run') == {'stage': 'ga'}
+    assert not (scratch / 'simulations').exists()
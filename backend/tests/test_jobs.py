@@ -0,0 +1,45 @@
+import multiprocessing
+import os
+import time
+
+from governor import CoreAllocator
+from job_registry import JobRegistry, process_alive
+from jobs import JobQueue, run_job
+
+CORES = sorted(os.sched_getaffinity(0))
+
+
+def launch_and_die(registry: JobRegistry, run_id: str):
+    # a server process that starts a job and dies without taking it down, as on a restart of the web server
+    job = multiprocessing.get_context('fork').Process(target=run_job, args=(time.sleep, (60,), {}, CORES[:1]))
+    job.start()
+    registry[run_id] = 'running'
+    registry.set_owner(run_id, job.pid)
+    os._exit(0)
+
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return condition()
+
+
+def test_cancels_a_job_left_running_by_a_dead_server(tmp_path):
+    registry = JobRegistry(tmp_path / 'jobs.sqlite3')
+    registry.create('run', 'simulation')
+    launcher = multiprocessing.get_context('fork').Process(target=launch_and_die, args=(registry, 'run'))
+    launcher.start()
+    launcher.join()
+    owner = registry.record('run')['owner']
+    assert process_alive(owner)
+
+    job_queue = JobQueue(registry, poll_interval=0.05, allocator=CoreAllocator(CORES, 1))
+    # adopted with the core it is pinned to
+    assert wait_for(lambda: job_queue.stats()['cores'] == {'run': CORES[:1]})
+    assert registry.take_orphans() == []
+
+    assert registry.request_cancel('run')
+    assert wait_for(lambda: registry['run'] == 'cancelled')
+    assert not process_alive(owner)
+    assert job_queue.stats()['cores'] == {}
@@ -0,0 +1,38 @@
+import os
+
+from job_registry import JobRegistry
+from retention import RetentionPolicy
+from simulation.cache import MESH_CACHE_DIR, MeshCache
+
+KB = 1000
+
+
+def write(path, size, mtime):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b'x' * size)
+    os.utime(path.parent, (mtime, mtime))
+
+
+def test_quota_evicts_least_recently_used_meshes_and_runs(tmp_path):
+    registry = JobRegistry(tmp_path / 'jobs.sqlite3')
+    root = tmp_path / 'simulations'
+    mesh_cache = root / MESH_CACHE_DIR
+    write(mesh_cache / 'old' / 'points', 4 * KB, 100)
+    write(mesh_cache / 'new' / 'points', 4 * KB, 300)
+    write(root / 'run' / 'T.gltf', 1 * KB, 200)
+    # a run meshed from the cache links its files, they take space once
+    os.link(mesh_cache / 'new' / 'points', root / 'run' / 'points')
+    os.utime(root / 'run', (200, 200))
+
+    policy = RetentionPolicy(compact_after=None, archive_after=None, evict_after=None, quota_bytes=6 * KB)
+    counts = policy.enforce(root, registry)
+
+    assert counts['evicted_meshes'] == 1 and counts['evicted'] == 0
+    assert [path.name for path in MeshCache(mesh_cache).entries()] == ['new']
+    assert (root / 'run').is_dir()
+
+    policy.quota_bytes = 3 * KB
+    counts = policy.enforce(root, registry)
+    # the run goes first, the space of its cached mesh only frees up with the cache entry
+    assert counts['evicted'] == 1 and counts['evicted_meshes'] == 1
+    assert not (root / 'run').exists() and MeshCache(mesh_cache).entries() == []
@@ -0,0 +1,58 @@
+import sys
+
+import pytest
+
+from simulation.Simulation import Simulation
+from simulation.supervisor import STOP_GRACE_ITERATIONS, ConvergenceCriteria, SolverSupervisor
+from simulation_runner import transform_config
+
+CRITERIA = ConvergenceCriteria(min_iterations=1)
+# A solver that has converged from the first iteration on and does not stop before endTime.
+END_TIME = 100000
+SOLVER = (
+    f'for i in range(1, {END_TIME + 1}):\n'
+    '    print(f"Time = {i}")\n'
+    '    print("smoothSolver:  Solving for Ux, Initial residual = 1e-06, Final residual = 1e-08, No Iterations 1")\n'
+)
+
+
+def iteration(i: int) -> list[str]:
+    return [f'Time = {i}', 'smoothSolver:  Solving for Ux, Initial residual = 1e-06, Final residual = 1e-08, No Iterations 1']
+
+
+def test_terminates_a_solver_that_ignores_the_stop():
+    supervisor = SolverSupervisor(CRITERIA, stop_grace_seconds=0)
+    actions = [supervisor.feed(line) for i in range(1, 2 * STOP_GRACE_ITERATIONS) for line in iteration(i)]
+
+    assert actions.count('stop') == 1
+    assert actions.count('terminate') == 1
+    # iterations keep being counted after the stop, terminate fires on the first one past the grace period
+    assert supervisor.iteration == supervisor.stopped_at + STOP_GRACE_ITERATIONS + 1
+    assert actions.index('terminate') == 2 * (supervisor.iteration - 1)
+
+
+def test_waits_the_grace_seconds_before_terminating():
+    supervisor = SolverSupervisor(CRITERIA)
+    actions = [supervisor.feed(line) for i in range(1, 4 * STOP_GRACE_ITERATIONS) for line in iteration(i)]
+
+    assert 'stop' in actions
+    assert 'terminate' not in actions
+
+
+def test_run_cmd_terminates_a_solver_that_ignores_the_stop(tmp_path, monkeypatch):
+    config = {
+        'room': {'dims': [4, 4, 3]},
+        'racks': [{'name': 'rack', 'pos': [1, 1, 0], 'dims': [0.6, 1.0, 2.0], 'power_watts': 5000}],
+        'cracs': [{'name': 'crac', 'pos': [3, 1, 0], 'dims': [0.6, 0.8, 1.8]}],
+        'tiles': [{'name': 'tile', 'pos': [1, 2.5, 0], 'dims': [0.6, 0.6, 0.01]}],
+        'physics': {},
+    }
+    sim = Simulation(transform_config(config), tmp_path / 'case', cell_size=0.5)
+    # the stop request goes unnoticed
+    monkeypatch.setattr(sim, 'request_stop', lambda: None)
+
+    log = tmp_path / 'log.solver'
+    with pytest.raises(RuntimeError, match='return code'):
+        sim._run_cmd([sys.executable, '-u', '-c', SOLVER], log, supervisor=SolverSupervisor(CRITERIA, stop_grace_seconds=0))
+    # the pipe buffers some iterations past the grace period before the signal arrives
+    assert log.read_text().count('Time = ') < END_TIME